@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import logging
+import os
+
+from stream_codec import Base64StreamDecoder
+
+"""
+* async_file_client.py adalah versi asyncio dari file_client_cli.py untuk
+  pemanggil dengan konkurensi tinggi (ribuan sesi dalam satu proses, atau
+  service yang sudah berbasis asyncio).
+
+* AsyncFileClient memakai ulang koneksi lewat pool (maksimal pool_size koneksi
+  ke satu server), dan setiap request dibatasi timeout.
+
+* Body tidak pernah ditampung utuh di memori:
+  - UPLOAD membaca file lokal per chunk, meng-encode base64 dan menulisnya
+    langsung ke socket (dengan backpressure drain()).
+  - GET membaca header JSON sampai field "data_file" (selalu diletakkan
+    paling akhir oleh server), lalu men-decode base64 per chunk ke file
+    tujuan sambil menghitung SHA-256.
+
+* Seperti fungsi remote_* di file_client_cli.py, setiap metode mengembalikan
+  dictionary respons server jika berhasil atau False jika gagal (error dicatat ke log).
+
+* Contoh:
+    async with AsyncFileClient('127.0.0.1', 6666) as client:
+        await client.upload('laporan.pdf')
+        with open('salinan.pdf', 'wb') as out:
+            await client.get('laporan.pdf', out=out)
+"""
+
+TERMINATOR = b"\r\n\r\n"
+DATA_FILE_MARKER = b'"data_file": "'
+RECV_SIZE = 256 * 1024
+# Kelipatan 3 agar setiap chunk bisa di-encode base64 sendiri tanpa padding di tengah
+UPLOAD_CHUNK_SIZE = 3 * 256 * 1024
+DEFAULT_TIMEOUT = 60
+DEFAULT_CONNECT_TIMEOUT = 10
+
+
+class _ResponseReader:
+    """
+    Membaca satu respons dari StreamReader. Respons yang mengandung data_file
+    diproses secara streaming; respons lain di-parse utuh.
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.buffer = bytearray()
+
+    async def _fill(self):
+        data = await self.reader.read(RECV_SIZE)
+        if not data:
+            raise ConnectionError("Server menutup koneksi sebelum respons lengkap.")
+        self.buffer += data
+
+    async def read(self, out=None, hasher=None):
+        """
+        Mengembalikan dictionary respons. Jika respons membawa data_file, isinya
+        di-decode ke 'out' (file object, opsional) dan 'hasher', lalu data_file
+        diganti dengan jumlah byte hasil decode di field 'data_received'.
+        """
+        scan = 0
+        while True:
+            marker = self.buffer.find(DATA_FILE_MARKER, scan)
+            if marker != -1:
+                return await self._read_streaming(marker, out, hasher)
+            end = self.buffer.find(TERMINATOR, scan)
+            if end != -1:
+                return json.loads(bytes(self.buffer[:end]).decode('utf-8'))
+            scan = max(0, len(self.buffer) - len(DATA_FILE_MARKER))
+            await self._fill()
+
+    async def _read_streaming(self, marker, out, hasher):
+        header_json = bytes(self.buffer[:marker]).rstrip().rstrip(b',') + b'}'
+        hasil = json.loads(header_json.decode('utf-8'))
+        del self.buffer[:marker + len(DATA_FILE_MARKER)]
+
+        decoder = Base64StreamDecoder()
+        received = 0
+        while True:
+            quote = self.buffer.find(b'"')
+            chunk = self.buffer if quote == -1 else self.buffer[:quote]
+            if chunk:
+                decoded = decoder.feed(bytes(chunk))
+                if hasher is not None:
+                    hasher.update(decoded)
+                if out is not None:
+                    out.write(decoded)
+                received += len(decoded)
+            if quote != -1:
+                del self.buffer[:quote + 1]
+                break
+            self.buffer.clear()
+            await self._fill()
+        decoder.finish()
+
+        while TERMINATOR not in self.buffer:
+            await self._fill()
+        trailer, _, _ = bytes(self.buffer).partition(TERMINATOR)
+        if trailer.strip() != b'}':
+            raise ValueError("data_file bukan field terakhir dalam respons GET.")
+        hasil['data_received'] = received
+        return hasil
+
+
+class AsyncFileClient:
+    def __init__(self, host, port, pool_size=4, timeout=DEFAULT_TIMEOUT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, client_id=None):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+        self._idle = [] # koneksi (reader, writer) yang siap dipakai ulang
+        self._slots = asyncio.Semaphore(pool_size)
+        self.connections_opened = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    @contextlib.asynccontextmanager
+    async def _connection(self):
+        """
+        Meminjam satu koneksi dari pool. Koneksi dikembalikan ke pool hanya jika
+        request selesai dengan bersih; jika terjadi error/timeout di tengah
+        respons, koneksi ditutup karena posisinya di stream tidak lagi pasti.
+        """
+        async with self._slots:
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = await asyncio.wait_for(asyncio.open_connection(*self.address), self.connect_timeout)
+                self.connections_opened += 1
+            try:
+                yield conn
+            except BaseException:
+                conn[1].close()
+                raise
+            self._idle.append(conn)
+
+    async def _request(self, command, params, body=None, out=None, hasher=None):
+        """
+        Mengirim satu perintah dan membaca responsnya dalam batas self.timeout.
+        'body' (opsional) adalah coroutine function yang menulis parameter
+        terakhir (string base64) langsung ke writer.
+        """
+        async with self._connection() as (reader, writer):
+            async def exchange():
+                if body is None:
+                    writer.write(json.dumps({"command": command, "params": params}).encode('utf-8') + TERMINATOR)
+                else:
+                    head = json.dumps({"command": command, "params": params})
+                    writer.write(head[:-2].encode('utf-8') + (b', "' if params else b'"'))
+                    await body(writer)
+                    writer.write(b'"]}' + TERMINATOR)
+                await writer.drain()
+                return await _ResponseReader(reader).read(out=out, hasher=hasher)
+            return await asyncio.wait_for(exchange(), self.timeout)
+
+    async def _call(self, label, *args, **kwargs):
+        try:
+            hasil = await self._request(*args, **kwargs)
+        except asyncio.TimeoutError:
+            logging.error(f"{self.client_prefix}{label} timeout setelah {self.timeout} detik.")
+            return False
+        except (OSError, ValueError) as e:
+            logging.error(f"{self.client_prefix}{label} gagal: {e}")
+            return False
+        if hasil.get('status') not in ('OK', 'NOT_MODIFIED'):
+            logging.error(f"{self.client_prefix}{label} gagal: {hasil.get('data', 'Unknown error')}")
+            return False
+        return hasil
+
+    async def list(self):
+        return await self._call("LIST", "LIST", [])
+
+    async def delete(self, filename):
+        return await self._call(f"DELETE '{filename}'", "DELETE", [filename])
+
+    async def get(self, filename, out=None, expected_sha256=None):
+        """
+        Mengunduh file; isinya ditulis ke 'out' (file object biner) jika diberikan.
+        Checksum dibandingkan dengan expected_sha256 atau data_sha256 dari server.
+        """
+        hasher = hashlib.sha256()
+        hasil = await self._call(f"GET '{filename}'", "GET", [filename], out=out, hasher=hasher)
+        if not hasil:
+            return False
+        expected_sha256 = expected_sha256 or hasil.get('data_sha256')
+        if expected_sha256 and hasher.hexdigest() != expected_sha256:
+            logging.error(f"{self.client_prefix}Checksum file '{filename}' tidak cocok: "
+                          f"{hasher.hexdigest()} != {expected_sha256}.")
+            return False
+        return hasil
+
+    async def upload(self, local_path, remote_name=None):
+        """
+        Mengunggah file lokal secara streaming. SHA-256 dihitung sambil membaca
+        dan dicocokkan dengan data_sha256 yang dilaporkan server.
+        """
+        remote_name = remote_name or os.path.basename(local_path)
+        hasher = hashlib.sha256()
+
+        async def body(writer):
+            with open(local_path, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(UPLOAD_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+                    writer.write(base64.b64encode(chunk))
+                    await writer.drain()
+
+        hasil = await self._call(f"UPLOAD '{remote_name}'", "UPLOAD", [remote_name], body=body)
+        if hasil and hasil.get('data_sha256') and hasil['data_sha256'] != hasher.hexdigest():
+            logging.error(f"{self.client_prefix}Checksum upload '{remote_name}' tidak cocok di server.")
+            return False
+        return hasil
@@ -0,0 +1,206 @@
+import heapq
+import itertools
+import threading
+import time
+
+"""
+* bandwidth.py mengatur pengiriman byte keluar dari server agar transfer
+  yang berjalan bersamaan mendapat bagian yang adil.
+
+* TokenBucket membatasi laju (byte/detik) dengan burst tertentu. Dipakai
+  untuk batas per koneksi, per klien (alamat IP) dan batas total server.
+
+* FairScheduler memecah respons besar menjadi chunk. Jika ada batas total
+  (--max-bandwidth), token total dibagikan per chunk lewat antrean
+  start-time fair queueing: flow yang paling sedikit menerima byte (tag
+  virtual terkecil) dilayani lebih dulu, sehingga satu transfer tidak bisa
+  memonopoli bandwidth sementara yang lain kelaparan sampai timeout.
+  Tanpa batas total tidak ada yang perlu dibagi: chunk langsung dikirim dan
+  pembagian bandwidth antar koneksi diserahkan ke kernel (--fair-send saja
+  hanya memecah pengiriman menjadi chunk).
+
+* Respons kecil (<= small_response) tidak ikut antre agar LIST/STAT/error
+  tetap cepat, tetapi tetap memakai token dari semua batas (total, per klien,
+  per koneksi) sehingga banyak respons kecil tidak bisa melewati batas.
+"""
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_SMALL_RESPONSE = 64 * 1024
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate / 10, DEFAULT_CHUNK_SIZE))
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def delay_for(self, n):
+        """
+        Detik yang harus ditunggu sebelum n byte tersedia (0 jika sudah cukup).
+        Tidak mengambil token.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            return max(0.0, (min(n, self.burst) - self.tokens) / self.rate)
+
+    def take(self, n):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= n # boleh negatif: chunk berikutnya akan menunggu lebih lama
+
+    def consume(self, n):
+        """
+        Menunggu sampai n byte diizinkan, lalu mengambil tokennya.
+        """
+        while True:
+            delay = self.delay_for(n)
+            if delay <= 0:
+                self.take(n)
+                return
+            time.sleep(delay)
+
+
+class _Flow:
+    __slots__ = ('client_key', 'conn_bucket', 'finish_tag')
+
+    def __init__(self, client_key, conn_bucket, finish_tag):
+        self.client_key = client_key
+        self.conn_bucket = conn_bucket
+        self.finish_tag = finish_tag
+
+
+class FairScheduler:
+    """
+    total_rate, per_connection_rate, per_client_rate dalam byte/detik; None berarti tanpa batas.
+    Urutan giliran fair queueing hanya berpengaruh jika total_rate diatur: tanpa
+    batas total, flow di kepala antrean langsung mendapat giliran.
+    """
+    def __init__(self, total_rate=None, per_connection_rate=None, per_client_rate=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, small_response=DEFAULT_SMALL_RESPONSE):
+        self.total_bucket = TokenBucket(total_rate) if total_rate else None
+        self.per_connection_rate = per_connection_rate
+        self.per_client_rate = per_client_rate
+        self.chunk_size = chunk_size
+        self.small_response = small_response
+
+        self.cond = threading.Condition()
+        self.waiting = [] # heap (start_tag, seq, flow)
+        self.seq = itertools.count()
+        self.virtual_time = 0.0
+        self.client_buckets = {} # client_key -> [TokenBucket, jumlah flow aktif]
+
+    def open_flow(self, client_key=None):
+        """
+        Membuka flow untuk satu koneksi. Flow (beserta bucket per koneksi dan
+        riwayat giliran fair queueing) dipakai untuk semua respons di koneksi
+        itu, lalu ditutup dengan close_flow() saat koneksi ditutup.
+        """
+        with self.cond:
+            if self.per_client_rate:
+                entry = self.client_buckets.setdefault(client_key, [TokenBucket(self.per_client_rate), 0])
+                entry[1] += 1
+            conn_bucket = TokenBucket(self.per_connection_rate) if self.per_connection_rate else None
+            # Flow baru mulai dari waktu virtual sekarang: tidak mendapat "tabungan" giliran
+            return _Flow(client_key, conn_bucket, self.virtual_time)
+
+    def close_flow(self, flow):
+        if not self.per_client_rate:
+            return
+        with self.cond:
+            entry = self.client_buckets.get(flow.client_key)
+            if entry:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self.client_buckets[flow.client_key]
+
+    def _acquire(self, flow, n):
+        """
+        Menunggu giliran untuk mengirim n byte: flow harus berada di kepala antrean
+        fair queueing dan token total harus tersedia.
+        """
+        with self.cond:
+            start_tag = max(self.virtual_time, flow.finish_tag)
+            flow.finish_tag = start_tag + n
+            entry = (start_tag, next(self.seq), flow)
+            heapq.heappush(self.waiting, entry)
+            while True:
+                if self.waiting[0] is entry:
+                    delay = self.total_bucket.delay_for(n) if self.total_bucket else 0
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                else:
+                    self.cond.wait()
+            heapq.heappop(self.waiting)
+            self.virtual_time = start_tag
+            if self.total_bucket:
+                self.total_bucket.take(n)
+            self.cond.notify_all()
+
+    def _throttle(self, flow, n):
+        """
+        Menunggu token per koneksi dan per klien untuk n byte.
+        """
+        if flow.conn_bucket:
+            flow.conn_bucket.consume(n)
+        if self.per_client_rate:
+            self.client_buckets[flow.client_key][0].consume(n)
+
+    def send(self, sock, data, flow=None, client_key=None):
+        """
+        Pengganti sock.sendall(data) yang mengikuti batas bandwidth dan giliran adil.
+        'flow' dari open_flow(); tanpa flow, satu flow sementara dibuka untuk data ini saja.
+        """
+        if flow is None:
+            flow = self.open_flow(client_key)
+            try:
+                self.send(sock, data, flow)
+            finally:
+                self.close_flow(flow)
+            return
+        if len(data) <= self.small_response:
+            # Respons kecil diprioritaskan (tidak ikut antre), tetapi tetap dihitung ke semua batas
+            if self.total_bucket:
+                self.total_bucket.consume(len(data))
+            self._throttle(flow, len(data))
+            sock.sendall(data)
+            return
+        view = memoryview(data)
+        for start in range(0, len(view), self.chunk_size):
+            chunk = view[start:start + self.chunk_size]
+            self._acquire(flow, len(chunk))
+            self._throttle(flow, len(chunk))
+            sock.sendall(chunk)
+
+
+def scheduler_from_args(args):
+    """
+    Membuat FairScheduler dari argumen command line server (--max-bandwidth,
+    --conn-bandwidth, --client-bandwidth dalam MB/detik, --small-response dalam KB).
+    Mengembalikan None jika tidak ada opsi bandwidth yang diaktifkan.
+    """
+    if not (args.fair_send or args.max_bandwidth or args.conn_bandwidth or args.client_bandwidth):
+        return None
+    mb = 1024 * 1024
+    return FairScheduler(total_rate=args.max_bandwidth * mb if args.max_bandwidth else None,
+                         per_connection_rate=args.conn_bandwidth * mb if args.conn_bandwidth else None,
+                         per_client_rate=args.client_bandwidth * mb if args.client_bandwidth else None,
+                         small_response=args.small_response * 1024)
+
+
+def add_bandwidth_args(parser):
+    group = parser.add_argument_group("bandwidth (lihat bandwidth.py)")
+    group.add_argument('--fair-send', action='store_true',
+                       help="kirim respons besar per chunk walaupun tanpa batas bandwidth "
+                            "(giliran adil hanya berlaku dengan --max-bandwidth)")
+    group.add_argument('--max-bandwidth', type=float, default=None, help="batas total byte keluar (MB/detik)")
+    group.add_argument('--conn-bandwidth', type=float, default=None, help="batas per koneksi (MB/detik)")
+    group.add_argument('--client-bandwidth', type=float, default=None, help="batas per alamat IP klien (MB/detik)")
+    group.add_argument('--small-response', type=int, default=DEFAULT_SMALL_RESPONSE // 1024,
+                       help="respons hingga ukuran ini (KB) dikirim tanpa antre")
@@ -0,0 +1,342 @@
+import os
+import sys
+import time
+import socket
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import csv
+from datetime import datetime
+
+import stress
+from durability import DURABILITY_MODES
+
+"""
+* benchmark_matrix.py menjalankan setiap implementasi server di localhost
+  (port ephemeral) dengan setiap jumlah worker, lalu menjalankan matriks
+  upload/get dari stress.py terhadap server tersebut.
+
+* Setiap server mendapat direktori penyimpanan sementara sendiri dan
+  dimatikan setelah matriksnya selesai, sehingga hasil antar server
+  bisa dibandingkan berdampingan (throughput, persentil latensi,
+  CPU dan RSS server).
+
+* --durability none,fsync,group menjalankan matriks untuk setiap mode
+  durability server (lihat durability.py); --small-files N menambahkan
+  uji N file kecil (profil corpus 'many_small') yang paling terpengaruh
+  oleh biaya fsync.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Daftar implementasi server yang diuji.
+# nama -> (skrip, apakah menerima argumen --workers)
+# Tambahkan server baru di sini agar ikut masuk ke matriks.
+SERVER_IMPLEMENTATIONS = {
+    'file_server': ('file_server.py', False),
+    'server_thread_pool': ('server_thread_pool.py', True),
+    'server_process_pool': ('server_process_pool.py', True),
+}
+
+STARTUP_TIMEOUT = 10
+SHUTDOWN_TIMEOUT = 5
+SAMPLE_INTERVAL = 0.2
+
+
+def find_free_port(host='127.0.0.1'):
+    """
+    Meminta port ephemeral dari OS dengan bind ke port 0.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def read_proc_cpu_seconds(pid):
+    """
+    Total waktu CPU (user + system) proses dalam detik, dari /proc/<pid>/stat.
+    Mengembalikan None jika /proc tidak tersedia (non-Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime dan stime adalah field ke-14 dan ke-15 (indeks 11 dan 12 setelah nama proses)
+        ticks = int(fields[11]) + int(fields[12])
+        return ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def read_proc_rss_bytes(pid):
+    """
+    Resident set size proses dalam byte, dari /proc/<pid>/status.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Mengambil sampel CPU dan RSS proses server secara berkala selama satu
+    kombinasi pengujian berjalan.
+    """
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.cpu_start = None
+        self.cpu_end = None
+        self.peak_rss = None
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        self.cpu_start = read_proc_cpu_seconds(self.pid)
+        while True:
+            rss = read_proc_rss_bytes(self.pid)
+            if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+                self.peak_rss = rss
+            if self.stop_event.wait(self.interval):
+                break
+        self.cpu_end = read_proc_cpu_seconds(self.pid)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        cpu_seconds = None
+        if self.cpu_start is not None and self.cpu_end is not None:
+            cpu_seconds = self.cpu_end - self.cpu_start
+        return cpu_seconds, self.peak_rss
+
+
+class ServerProcess:
+    """
+    Menjalankan satu implementasi server sebagai subprocess di localhost.
+    """
+    def __init__(self, name, script, workers=None, host='127.0.0.1', log_dir=None, extra_args=None):
+        self.name = name
+        self.script = os.path.join(BASE_DIR, script)
+        self.workers = workers
+        self.host = host
+        self.port = find_free_port(host)
+        self.storage_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+        self.log_dir = log_dir or stress.RESULTS_DIR
+        self.extra_args = extra_args or []
+        self.process = None
+        self.log_file = None
+
+    @property
+    def address(self):
+        return (self.host, self.port)
+
+    def start(self):
+        cmd = [sys.executable, self.script, '--host', self.host, '--port', str(self.port),
+               '--storage-dir', self.storage_dir] + self.extra_args
+        if self.workers is not None:
+            cmd += ['--workers', str(self.workers)]
+        log_path = os.path.join(self.log_dir, f"server_{self.name}_{self.workers or 'na'}.log")
+        self.log_file = open(log_path, 'w')
+        self.process = subprocess.Popen(cmd, stdout=self.log_file, stderr=subprocess.STDOUT, cwd=BASE_DIR)
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server {self.name} berhenti saat startup (lihat {log_path})")
+            try:
+                with socket.create_connection(self.address, timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"Server {self.name} tidak siap dalam {STARTUP_TIMEOUT} detik (lihat {log_path})")
+
+    def stop(self):
+        """
+        Mematikan server: SIGINT dulu (sama seperti Ctrl+C), lalu terminate/kill
+        jika proses tidak berhenti, kemudian menghapus direktori penyimpanannya.
+        """
+        if self.process is not None and self.process.poll() is None:
+            for stopper in (lambda: self.process.send_signal(signal.SIGINT),
+                            self.process.terminate,
+                            self.process.kill):
+                stopper()
+                try:
+                    self.process.wait(timeout=SHUTDOWN_TIMEOUT)
+                    break
+                except subprocess.TimeoutExpired:
+                    continue
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+        shutil.rmtree(self.storage_dir, ignore_errors=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def _result_row(name, workers, durability, res, cpu_seconds, peak_rss):
+    return {
+        'server': name,
+        'server_workers': workers if workers is not None else 'N/A',
+        'durability': durability,
+        'operation': res['operation'],
+        'volume_mb': res['file_volume_mb'],
+        'client_workers': res['client_workers'],
+        'client_processes': res['client_processes'],
+        'success': res['successful_client_workers'],
+        'failed': res['failed_client_workers'],
+        'throughput_bps': res['aggregate_throughput_bps'],
+        'ops_per_s': res['successful_client_workers'] / res['wall_time_s'] if res['wall_time_s'] > 0 else 0,
+        'p50_s': res['latency_p50_s'],
+        'p90_s': res['latency_p90_s'],
+        'p99_s': res['latency_p99_s'],
+        'server_cpu_s': cpu_seconds,
+        'server_cpu_pct': (cpu_seconds / res['wall_time_s'] * 100
+                           if cpu_seconds is not None and res['wall_time_s'] > 0 else None),
+        'server_peak_rss_mb': peak_rss / (1024 * 1024) if peak_rss is not None else None,
+    }
+
+
+def run_server_matrix(name, script, workers, volumes, client_pools, durability=DURABILITY_MODES[0], small_files=0):
+    """
+    Menjalankan matriks upload/get untuk satu server dengan satu jumlah worker
+    dan satu mode durability.
+    """
+    rows = []
+    print(f"\n=== Server {name} (worker: {workers if workers is not None else 'N/A'}, durability: {durability}) ===")
+    extra_args = ['--durability', durability]
+    with ServerProcess(name, script, workers=workers, extra_args=extra_args) as server:
+        workers_info = workers if workers is not None else 'N/A'
+        for volume in volumes:
+            for client_pool in client_pools:
+                for operation in stress.OPERATIONS:
+                    sampler = ResourceSampler(server.process.pid)
+                    sampler.start()
+                    res = stress.run_test_combination(operation, volume, client_pool, workers_info,
+                                                      server_address_tuple=server.address)
+                    cpu_seconds, peak_rss = sampler.stop()
+                    if res is None:
+                        continue
+                    rows.append(_result_row(name, workers, durability, res, cpu_seconds, peak_rss))
+        if small_files:
+            for client_pool in client_pools:
+                # Satu operasi per panggilan agar CPU/RSS server diukur terpisah untuk upload dan get
+                for operation in stress.OPERATIONS:
+                    sampler = ResourceSampler(server.process.pid)
+                    sampler.start()
+                    combination = stress.run_corpus_combination('many_small', small_files, 1, client_pool,
+                                                                workers_info, server_address_tuple=server.address,
+                                                                operations=[operation])
+                    cpu_seconds, peak_rss = sampler.stop()
+                    for res in combination:
+                        rows.append(_result_row(name, workers, durability, res, cpu_seconds, peak_rss))
+    return rows
+
+
+def _fmt(value, fmt):
+    return format(value, fmt) if value is not None else 'N/A'
+
+
+def print_comparison(rows):
+    """
+    Mencetak tabel perbandingan berdampingan, dikelompokkan per operasi/volume/klien.
+    """
+    header = (f"{'Server':<22}{'SrvW':>6}{'Durab':>7}{'Op':>28}{'MB':>6}{'Cli':>5}{'OK/Fail':>9}"
+              f"{'MB/s':>10}{'ops/s':>9}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}{'CPU s':>8}{'CPU %':>8}{'RSS MB':>9}")
+    print("\n\n=============== PERBANDINGAN SERVER ===============\n")
+    print(header)
+    print('-' * len(header))
+    key = lambda r: (r['operation'], r['volume_mb'], r['client_workers'], r['server'], str(r['server_workers']),
+                     DURABILITY_MODES.index(r['durability']))
+    last_group = None
+    for r in sorted(rows, key=key):
+        group = (r['operation'], r['volume_mb'], r['client_workers'])
+        if last_group is not None and group != last_group:
+            print()
+        last_group = group
+        print(f"{r['server']:<22}{str(r['server_workers']):>6}{r['durability']:>7}{r['operation']:>28}{r['volume_mb']:>6}"
+              f"{r['client_workers']:>5}{str(r['success']) + '/' + str(r['failed']):>9}"
+              f"{r['throughput_bps'] / (1024 * 1024):>10.2f}{r['ops_per_s']:>9.1f}{r['p50_s']:>9.3f}{r['p90_s']:>9.3f}{r['p99_s']:>9.3f}"
+              f"{_fmt(r['server_cpu_s'], '.2f'):>8}{_fmt(r['server_cpu_pct'], '.0f'):>8}"
+              f"{_fmt(r['server_peak_rss_mb'], '.1f'):>9}")
+
+
+def save_comparison_to_csv(rows, filename):
+    filepath = os.path.join(stress.RESULTS_DIR, filename)
+    fieldnames = ['server', 'server_workers', 'durability', 'operation', 'volume_mb', 'client_workers',
+                  'client_processes', 'success', 'failed',
+                  'throughput_bps', 'ops_per_s', 'p50_s', 'p90_s', 'p99_s', 'server_cpu_s', 'server_cpu_pct', 'server_peak_rss_mb']
+    with open(filepath, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for r in rows:
+            writer.writerow({k: ('N/A' if r[k] is None else r[k]) for k in fieldnames})
+    print(f"\nPerbandingan server telah disimpan ke: {filepath}")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def _durability_list(value):
+    modes = [v for v in value.split(',') if v]
+    for mode in modes:
+        if mode not in DURABILITY_MODES:
+            raise argparse.ArgumentTypeError(f"mode durability tidak dikenal: {mode}")
+    return modes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Matriks benchmark end-to-end semua server di localhost")
+    parser.add_argument('--servers', default=','.join(SERVER_IMPLEMENTATIONS),
+                        help="daftar server dipisah koma (default: semua)")
+    parser.add_argument('--server-workers', type=_int_list, default=stress.SERVER_WORKER_POOLS)
+    parser.add_argument('--volumes', type=_int_list, default=stress.FILE_VOLUMES_MB, help="ukuran file dalam MB")
+    parser.add_argument('--clients', type=_int_list, default=stress.CLIENT_WORKER_POOLS)
+    parser.add_argument('--client-processes', type=int, default=stress.CLIENT_PROCESSES,
+                        help="jumlah proses agen load generator (1 = semua klien sebagai thread)")
+    parser.add_argument('--durability', type=_durability_list, default=[DURABILITY_MODES[0]],
+                        help=f"mode durability server dipisah koma ({','.join(DURABILITY_MODES)})")
+    parser.add_argument('--small-files', type=int, default=0,
+                        help="jumlah file kecil (profil many_small) yang diunggah/diunduh per jumlah klien (0 = tidak)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stress.CLIENT_PROCESSES = args.client_processes
+    rows = []
+    for name in args.servers.split(','):
+        if name not in SERVER_IMPLEMENTATIONS:
+            print(f"ERROR: Server tidak dikenal: {name}")
+            continue
+        script, accepts_workers = SERVER_IMPLEMENTATIONS[name]
+        worker_counts = args.server_workers if accepts_workers else [None]
+        for workers in worker_counts:
+            for durability in args.durability:
+                try:
+                    rows.extend(run_server_matrix(name, script, workers, args.volumes, args.clients,
+                                                  durability=durability, small_files=args.small_files))
+                except RuntimeError as e:
+                    print(f"ERROR: {e}")
+
+    print_comparison(rows)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_comparison_to_csv(rows, f"server_comparison_{timestamp}.csv")
+
+
+if __name__ == '__main__':
+    main()
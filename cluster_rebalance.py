@@ -0,0 +1,139 @@
+import sys
+import argparse
+import logging
+
+from file_client_cli import connect_to_server, send_command_persistent
+from hash_ring import HashRing, parse_node, parse_node_list, DEFAULT_VNODES
+
+"""
+* cluster_rebalance.py memindahkan file antar node setelah daftar node
+  cluster berubah (node ditambah atau dihapus).
+
+* Untuk setiap file di setiap node lama, pemilik baru dihitung dengan
+  HashRing daftar node baru. Hanya file yang pemiliknya berubah yang
+  dipindahkan: GET dari node asal, UPLOAD ke node tujuan (payload base64
+  diteruskan apa adanya tanpa decode/encode ulang), cek checksum SHA-256
+  yang dilaporkan node tujuan, lalu DELETE dari node asal.
+
+* Contoh menambah node ketiga:
+    python cluster_rebalance.py --old 127.0.0.1:7001,127.0.0.1:7002 \\
+        --new 127.0.0.1:7001,127.0.0.1:7002,127.0.0.1:7003
+"""
+
+
+class NodeConnections:
+    """
+    Satu koneksi persistent per node, dibuka saat pertama kali dibutuhkan.
+    """
+    def __init__(self):
+        self.sockets = {}
+
+    def command(self, node, command_dict):
+        sock = self.sockets.get(node)
+        if sock is None:
+            sock = connect_to_server(parse_node(node))
+            if sock is None:
+                return False
+            self.sockets[node] = sock
+        hasil = send_command_persistent(sock, command_dict)
+        if hasil is False:
+            self.sockets.pop(node).close()
+        return hasil
+
+    def close(self):
+        for sock in self.sockets.values():
+            sock.close()
+        self.sockets = {}
+
+
+def plan_moves(listing, new_ring):
+    """
+    listing: dictionary node -> daftar nama file di node tersebut.
+    Mengembalikan list (nama_file, node_asal, node_tujuan) untuk file yang
+    pemiliknya berubah di ring baru.
+    """
+    moves = []
+    for node, names in listing.items():
+        for name in names:
+            owner = new_ring.get_node(name)
+            if owner != node:
+                moves.append((name, node, owner))
+    return moves
+
+
+def move_file(conns, name, source, target):
+    hasil = conns.command(source, {"command": "GET", "params": [name]})
+    if not hasil or hasil.get('status') != 'OK':
+        logging.error(f"GET '{name}' dari {source} gagal: {hasil.get('data') if hasil else 'tidak ada respons'}")
+        return False
+
+    upload = conns.command(target, {"command": "UPLOAD", "params": [name, hasil['data_file']]})
+    if not upload or upload.get('status') != 'OK':
+        logging.error(f"UPLOAD '{name}' ke {target} gagal: {upload.get('data') if upload else 'tidak ada respons'}")
+        return False
+    if hasil.get('data_sha256') and upload.get('data_sha256') != hasil['data_sha256']:
+        logging.error(f"Checksum '{name}' di {target} tidak cocok; file asal di {source} tidak dihapus.")
+        return False
+
+    deleted = conns.command(source, {"command": "DELETE", "params": [name]})
+    if not deleted or deleted.get('status') != 'OK':
+        logging.error(f"DELETE '{name}' dari {source} gagal; file kini ada di dua node.")
+        return False
+    return True
+
+
+def rebalance(old_nodes, new_nodes, vnodes=DEFAULT_VNODES, dry_run=False):
+    """
+    Mengembalikan (jumlah_dipindah, jumlah_gagal, total_file).
+    Node yang dihapus dari cluster harus masih berjalan selama rebalance
+    agar file-nya bisa dipindahkan.
+    """
+    new_ring = HashRing(new_nodes, vnodes=vnodes)
+    conns = NodeConnections()
+    try:
+        listing = {}
+        for node in old_nodes:
+            # LIST all: termasuk file yang tidak tampil di LIST biasa (nama tanpa titik),
+            # agar tidak tertinggal di node yang tidak lagi menjadi pemiliknya
+            hasil = conns.command(node, {"command": "LIST", "params": ["all"]})
+            if not hasil or hasil.get('status') != 'OK':
+                raise RuntimeError(f"LIST ke node {node} gagal; rebalance dibatalkan.")
+            listing[node] = hasil['data']
+        total = sum(len(names) for names in listing.values())
+
+        moves = plan_moves(listing, new_ring)
+        logging.warning(f"{len(moves)} dari {total} file perlu dipindahkan.")
+        moved = failed = 0
+        for name, source, target in moves:
+            logging.info(f"'{name}': {source} -> {target}")
+            if dry_run:
+                continue
+            if move_file(conns, name, source, target):
+                moved += 1
+            else:
+                failed += 1
+        return moved, failed, total
+    finally:
+        conns.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebalance file setelah node cluster ditambah/dihapus")
+    parser.add_argument('--old', required=True, help="daftar node lama: h1:p1,h2:p2 atau @file")
+    parser.add_argument('--new', required=True, help="daftar node baru: h1:p1,h2:p2 atau @file")
+    parser.add_argument('--vnodes', type=int, default=DEFAULT_VNODES)
+    parser.add_argument('--dry-run', action='store_true', help="hanya tampilkan rencana pemindahan")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    args = parse_args(argv)
+    moved, failed, total = rebalance(parse_node_list(args.old), parse_node_list(args.new),
+                                     vnodes=args.vnodes, dry_run=args.dry_run)
+    print(f"Selesai: {moved} dipindahkan, {failed} gagal, dari total {total} file.")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
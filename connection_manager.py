@@ -0,0 +1,439 @@
+import re
+import json
+import socket
+import selectors
+import logging
+import time
+import queue
+
+import tracing
+
+"""
+* ConnectionManager memisahkan "koneksi terbuka" dari "pekerjaan aktif".
+  Satu thread selector memegang semua socket klien yang sedang idle
+  (keep-alive) dan membaca data secara non-blocking. Koneksi baru
+  diserahkan ke worker pool hanya jika satu frame request lengkap
+  (diakhiri "\r\n\r\n") sudah diterima.
+
+* Setelah worker selesai memproses semua frame lengkap, socket
+  dikembalikan ke selector (diparkir lagi). Dengan begitu ukuran pool
+  membatasi jumlah request yang dikerjakan bersamaan, bukan jumlah
+  koneksi yang terbuka.
+
+* Koneksi yang idle lebih lama dari idle_timeout ditutup.
+
+* Frame UPLOAD dari klien lama ({"command": "UPLOAD", "params": [nama, "<base64>"]})
+  tidak ditunggu sampai lengkap: begitu awal frame sampai ke tanda kutip pembuka
+  payload diterima, upload dimulai dan setiap potongan payload yang tiba
+  langsung di-decode ke disk, sehingga memori server tidak bertambah sebesar
+  ukuran file. Worker hanya memproses data yang sudah ada di socket; jika
+  klien belum mengirim lagi, koneksi (beserta status upload-nya) diparkir
+  kembali di selector, sehingga upload yang lambat atau macet tidak menahan
+  worker. Upload yang sedang berjalan juga ikut ditutup oleh idle_timeout.
+  Escape string JSON di payload (\\/, \\n, ...) di-unescape saat dialirkan,
+  sehingga hasilnya sama dengan frame yang di-parse utuh dengan json.loads.
+
+* Handler yang dibuat oleh handler_factory(connection, address) harus
+  memiliki:
+    - process_message(message): memproses satu frame (str tanpa pemisah),
+      mengirim respons, dan mengembalikan False jika koneksi harus ditutup
+    - begin_upload(filename): memulai frame UPLOAD streaming; mengembalikan
+      objek dengan feed(data) (potongan payload base64) dan abort()
+    - finish_upload(upload): dipanggil setelah frame UPLOAD selesai dibaca;
+      mengirim respons dan mengembalikan False jika koneksi harus ditutup
+    - handle_error(exc): dipanggil saat terjadi error pada koneksi
+    - close(): menutup koneksi
+"""
+
+TERMINATOR = b"\r\n\r\n"
+# Antrean koneksi yang belum di-accept; dibatasi lagi oleh net.core.somaxconn.
+# Backlog kecil membuat SYN klien dibuang saat ribuan klien terhubung bersamaan.
+LISTEN_BACKLOG = 1024
+RECV_SIZE = 65536
+DEFAULT_IDLE_TIMEOUT = 120
+SELECT_TIMEOUT = 1.0
+# Awal frame UPLOAD sampai tanda kutip pembuka payload base64 (parameter kedua)
+UPLOAD_PREFIX = re.compile(rb'\s*\{\s*"command"\s*:\s*"(?i:upload)"\s*,\s*"params"\s*:\s*\[\s*'
+                           rb'("(?:[^"\\]|\\.)*")\s*,\s*"')
+# Prefix UPLOAD hanya dicari sejauh ini dari awal buffer; juga batas sisa frame setelah payload
+UPLOAD_PREFIX_LIMIT = 4096
+# Payload upload yang terkumpul di selector sebelum koneksi diserahkan lagi ke worker
+UPLOAD_FEED_MIN = RECV_SIZE
+# Batas byte yang dibaca satu worker untuk satu upload sebelum koneksi diparkir lagi,
+# agar upload besar yang cepat bergiliran dengan request lain di antrean worker
+UPLOAD_WORK_SLICE = 4 * 1024 * 1024
+# Bagian payload UPLOAD yang utuh: karakter biasa dan escape string JSON lengkap
+# (misalnya \/ atau \n dari encoder lain), berhenti di tanda kutip penutup
+PAYLOAD_SEGMENT = re.compile(rb'(?:[^"\\]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+# Panjang escape JSON terpanjang (\uXXXX)
+MAX_ESCAPE_LEN = 6
+
+
+class _Connection:
+    __slots__ = ('sock', 'address', 'handler', 'buffer', 'scan_pos', 'last_active', 'closed',
+                 'frame_started_at', 'frame_ready_at', 'upload', 'payload_done')
+
+    def __init__(self, sock, address, handler):
+        self.sock = sock
+        self.address = address
+        self.handler = handler
+        self.buffer = bytearray()
+        self.scan_pos = 0 # posisi awal pencarian pemisah agar buffer tidak dipindai ulang
+        self.last_active = time.monotonic()
+        self.closed = False
+        # Hanya diisi saat tracing aktif: byte pertama frame diterima / frame siap diproses
+        self.frame_started_at = None
+        self.frame_ready_at = None
+        self.upload = None # UPLOAD streaming yang sedang berjalan (lihat begin_upload)
+        self.payload_done = False # tanda kutip penutup payload upload sudah diterima
+
+    def has_frame(self):
+        idx = self.buffer.find(TERMINATOR, max(0, self.scan_pos - len(TERMINATOR) + 1))
+        if idx < 0:
+            self.scan_pos = len(self.buffer)
+            return False
+        return True
+
+    def pop_frame(self):
+        idx = self.buffer.find(TERMINATOR)
+        if idx < 0:
+            return None
+        message = bytes(self.buffer[:idx])
+        del self.buffer[:idx + len(TERMINATOR)]
+        self.scan_pos = 0
+        return message.decode('utf-8')
+
+    def upload_prefix(self):
+        """
+        (nama_file, posisi_awal_payload) jika buffer diawali frame UPLOAD yang
+        payload-nya bisa dialirkan, selain itu None.
+        """
+        m = UPLOAD_PREFIX.match(self.buffer, 0, UPLOAD_PREFIX_LIMIT)
+        if m is None:
+            return None
+        try:
+            filename = json.loads(m.group(1))
+        except ValueError:
+            return None # biarkan diproses sebagai frame biasa (dan ditolak di sana)
+        return filename, m.end()
+
+    def upload_ready(self):
+        """
+        True jika upload yang sedang berjalan punya cukup data baru untuk diproses
+        worker: sebagian besar payload, akhir payload, atau pemisah frame.
+        """
+        if self.payload_done:
+            return TERMINATOR in self.buffer or len(self.buffer) > UPLOAD_PREFIX_LIMIT
+        return len(self.buffer) >= UPLOAD_FEED_MIN or b'"' in self.buffer
+
+    def process_ready(self):
+        """
+        Memproses semua yang bisa diproses dari buffer tanpa menunggu data baru:
+        frame lengkap, serta payload UPLOAD streaming yang sudah diterima.
+        Mengembalikan False jika koneksi harus ditutup.
+        """
+        while True:
+            if self.upload is not None:
+                if not self._feed_upload():
+                    return True # upload belum selesai, tunggu data berikutnya
+                upload, self.upload = self.upload, None
+                if not self.handler.finish_upload(upload):
+                    return False
+                continue
+            if self.has_frame():
+                if not self.handler.process_message(self.pop_frame()):
+                    return False
+                continue
+            prefix = self.upload_prefix()
+            if prefix is None:
+                return True
+            filename, body_start = prefix
+            del self.buffer[:body_start]
+            self.scan_pos = 0
+            self.payload_done = False
+            self.upload = self.handler.begin_upload(filename)
+
+    def _feed_upload(self):
+        """
+        Meneruskan payload di buffer ke upload yang sedang berjalan. Mengembalikan
+        True jika seluruh frame UPLOAD (sampai pemisah) sudah terbaca.
+        """
+        if not self.payload_done:
+            quote = self.buffer.find(b'"')
+            end = len(self.buffer) if quote < 0 else quote
+            if self.buffer.find(b'\\', 0, end) >= 0:
+                end, quote = self._escaped_segment_end()
+                if end:
+                    self.upload.feed(json.loads(b'"' + self.buffer[:end] + b'"'))
+            elif end:
+                self.upload.feed(bytes(self.buffer[:end]))
+            if quote < 0:
+                del self.buffer[:end]
+                return False
+            del self.buffer[:quote + 1]
+            self.payload_done = True
+        idx = self.buffer.find(TERMINATOR)
+        if idx < 0:
+            if len(self.buffer) > UPLOAD_PREFIX_LIMIT:
+                raise ValueError("Frame UPLOAD tidak valid: pemisah tidak ditemukan setelah payload.")
+            return False
+        del self.buffer[:idx + len(TERMINATOR)]
+        self.scan_pos = 0
+        return True
+
+    def _escaped_segment_end(self):
+        """
+        (akhir bagian payload yang bisa di-unescape, posisi tanda kutip penutup
+        atau -1) untuk payload yang mengandung escape JSON. Escape yang terpotong
+        di akhir buffer disisakan sampai data berikutnya tiba.
+        """
+        end = PAYLOAD_SEGMENT.match(self.buffer).end()
+        if end == len(self.buffer):
+            return end, -1
+        if self.buffer[end] == ord('"'):
+            return end, end
+        if len(self.buffer) - end < MAX_ESCAPE_LEN and b'"' not in self.buffer[end:]:
+            return end, -1 # escape belum lengkap
+        raise ValueError("Frame UPLOAD tidak valid: escape JSON tidak dikenal di payload.")
+
+    def abort_upload(self):
+        if self.upload is not None:
+            upload, self.upload = self.upload, None
+            upload.abort()
+
+
+def serve_connection(sock, address, handler):
+    """
+    Loop blocking untuk satu koneksi (mode lama: satu worker/thread per koneksi)
+    dengan parser request yang sama seperti ConnectionManager. Kembali saat klien
+    menutup koneksi atau handler meminta koneksi ditutup; error diteruskan ke pemanggil.
+    """
+    conn = _Connection(sock, address, handler)
+    try:
+        while True:
+            data = sock.recv(RECV_SIZE)
+            if not data:
+                logging.warning(f"Client {address} disconnected gracefully.")
+                return
+            if conn.frame_started_at is None and conn.upload is None and tracing.enabled():
+                conn.frame_started_at = time.perf_counter()
+            conn.buffer += data
+            if conn.frame_started_at is not None and (conn.has_frame() or conn.upload_prefix()):
+                tracing.note_phase('recv', conn.frame_started_at, time.perf_counter())
+                conn.frame_started_at = None
+            if not conn.process_ready():
+                return
+    finally:
+        conn.abort_upload()
+
+
+class ConnectionManager:
+    def __init__(self, listen_socket, executor, handler_factory, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.listen_socket = listen_socket
+        self.executor = executor
+        self.handler_factory = handler_factory
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.parked = {} # socket -> _Connection yang sedang diparkir di selector
+        self.returned = queue.SimpleQueue() # koneksi yang dikembalikan worker
+        self.running = False
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+    def serve_forever(self):
+        self.listen_socket.setblocking(False)
+        self.selector.register(self.listen_socket, selectors.EVENT_READ, 'accept')
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, 'wakeup')
+        self.running = True
+        last_idle_check = time.monotonic()
+        try:
+            while self.running:
+                for key, _ in self.selector.select(timeout=SELECT_TIMEOUT):
+                    if key.data == 'accept':
+                        self._accept()
+                    elif key.data == 'wakeup':
+                        self._drain_wakeup()
+                    else:
+                        self._read(key.data)
+                self._repark_returned()
+
+                now = time.monotonic()
+                if now - last_idle_check >= SELECT_TIMEOUT:
+                    self._close_idle(now)
+                    last_idle_check = now
+        finally:
+            for conn in list(self.parked.values()):
+                self._close(conn)
+            self.selector.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def shutdown(self):
+        self.running = False
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass # buffer wakeup penuh berarti selector memang akan bangun
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logging.error(f"Error accepting new connection: {e}")
+                return
+            logging.warning(f"Koneksi dari {address}")
+            try:
+                sock.setblocking(False)
+                handler = self.handler_factory(sock, address)
+            except Exception as e:
+                # Gagal menyiapkan satu koneksi tidak boleh menghentikan thread selector
+                logging.error(f"Error preparing connection {address}: {e}", exc_info=True)
+                sock.close()
+                continue
+            self._park(_Connection(sock, address, handler))
+
+    def _park(self, conn):
+        conn.last_active = time.monotonic()
+        self.parked[conn.sock] = conn
+        self.selector.register(conn.sock, selectors.EVENT_READ, conn)
+
+    def _unpark(self, conn):
+        self.selector.unregister(conn.sock)
+        del self.parked[conn.sock]
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            # ConnectionResetError, ETIMEDOUT, ECONNABORTED, ...: hanya koneksi ini yang ditutup
+            if isinstance(e, ConnectionResetError):
+                logging.warning(f"Client {conn.address} forcibly disconnected.")
+            else:
+                logging.warning(f"Error reading from client {conn.address}: {e}")
+            try:
+                conn.handler.handle_error(e)
+            except Exception:
+                logging.exception(f"Error handling failure of client {conn.address}")
+            self._unpark(conn)
+            self._close(conn)
+            return
+        if not data:
+            logging.warning(f"Client {conn.address} disconnected gracefully.")
+            self._unpark(conn)
+            self._close(conn)
+            return
+        if conn.upload is not None:
+            conn.buffer += data
+            conn.last_active = time.monotonic()
+            if conn.upload_ready():
+                # Lanjutan payload UPLOAD streaming; fasenya dicatat oleh upload itu sendiri
+                self._unpark(conn)
+                self.executor.submit(self._work, conn)
+            return
+        if conn.frame_started_at is None and tracing.enabled():
+            conn.frame_started_at = time.perf_counter()
+        conn.buffer += data
+        conn.last_active = time.monotonic()
+        if conn.has_frame() or conn.upload_prefix():
+            # Frame lengkap (atau awal UPLOAD yang dialirkan): keluarkan dari selector
+            # dan serahkan ke worker pool
+            if conn.frame_started_at is not None:
+                conn.frame_ready_at = time.perf_counter()
+            self._unpark(conn)
+            self.executor.submit(self._work, conn)
+
+    def _work(self, conn):
+        """
+        Dijalankan di worker pool: memproses semua request yang siap di buffer.
+        Selama di worker, socket blocking dengan timeout idle_timeout (untuk
+        mengirim respons). Payload UPLOAD streaming hanya dibaca selama sudah
+        tersedia di socket; jika belum, koneksi diparkir lagi dan worker dilepas.
+        """
+        if conn.frame_ready_at is not None:
+            # Dicatat oleh request span pertama yang diproses worker ini (jika terpilih sampling)
+            tracing.note_phase('recv', conn.frame_started_at, conn.frame_ready_at, thread='selector')
+            tracing.note_phase('executor_queue', conn.frame_ready_at, time.perf_counter())
+        conn.frame_started_at = conn.frame_ready_at = None
+        try:
+            conn.sock.settimeout(self.idle_timeout)
+            received = 0
+            while True:
+                if not conn.process_ready():
+                    conn.abort_upload()
+                    self._close(conn)
+                    return
+                if conn.upload is None or received >= UPLOAD_WORK_SLICE:
+                    break
+                data = self._recv_available(conn)
+                if data is None:
+                    break
+                conn.buffer += data
+                received += len(data)
+            conn.sock.setblocking(False)
+        except Exception as e:
+            conn.abort_upload()
+            conn.handler.handle_error(e)
+            self._close(conn)
+            return
+        self.returned.put(conn)
+        self._wakeup()
+
+    def _recv_available(self, conn):
+        """
+        recv tanpa menunggu: None jika belum ada data di socket.
+        """
+        conn.sock.setblocking(False)
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return None
+        finally:
+            conn.sock.settimeout(self.idle_timeout)
+        if not data:
+            raise ConnectionError("Koneksi ditutup sebelum frame UPLOAD lengkap.")
+        return data
+
+    def _repark_returned(self):
+        while True:
+            try:
+                conn = self.returned.get_nowait()
+            except queue.Empty:
+                return
+            if conn.closed:
+                continue
+            self._park(conn)
+
+    def _close_idle(self, now):
+        for conn in list(self.parked.values()):
+            if now - conn.last_active > self.idle_timeout:
+                logging.warning(f"Menutup koneksi idle {conn.address} (> {self.idle_timeout} detik).")
+                self._unpark(conn)
+                self._close(conn)
+
+    def _close(self, conn):
+        if conn.closed:
+            return
+        conn.closed = True
+        for step in (conn.abort_upload, conn.handler.close):
+            try:
+                step()
+            except OSError:
+                pass
+            except Exception:
+                logging.exception(f"Error closing connection {conn.address}")
@@ -0,0 +1,170 @@
+import os
+import json
+import math
+import random
+import hashlib
+import logging
+import threading
+
+"""
+* corpus.py membuat file uji untuk stress test dengan isi yang realistis:
+  entropi bisa diatur (0.0 = semua byte nol, 1.0 = seluruhnya acak) dan
+  ukuran file bisa mengikuti distribusi tertentu (banyak file kecil,
+  sedikit file besar).
+
+* File yang sudah dibuat di-cache di CORPUS_DIR bersama manifest.json yang
+  menyimpan parameter pembuatan dan checksum SHA-256-nya, sehingga run
+  berikutnya tidak perlu membuat ulang maupun menghitung ulang checksum.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, "test_files", "corpus")
+MANIFEST_NAME = "manifest.json"
+
+BLOCK_SIZE = 1024 * 1024
+
+# Profil distribusi ukuran file yang dikenal build_corpus()
+SIZE_PROFILES = ('uniform', 'many_small', 'mixed')
+
+_manifest_lock = threading.Lock()
+
+
+def _manifest_path(corpus_dir):
+    return os.path.join(corpus_dir, MANIFEST_NAME)
+
+
+def load_manifest(corpus_dir=CORPUS_DIR):
+    try:
+        with open(_manifest_path(corpus_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, corpus_dir=CORPUS_DIR):
+    tmp_path = _manifest_path(corpus_dir) + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, _manifest_path(corpus_dir))
+
+
+def _block_content(rng, size, entropy):
+    """
+    Satu blok data: bagian awal acak (sebanyak entropy * size byte), sisanya
+    pola berulang yang mudah dikompresi.
+    """
+    random_len = int(size * entropy)
+    filler_len = size - random_len
+    random_part = rng.randbytes(random_len) if random_len else b''
+    filler = (b'ETS-PROGJAR-' * (filler_len // 12 + 1))[:filler_len]
+    return random_part + filler
+
+
+def generate_file(path, size_bytes, entropy=1.0, seed=0):
+    """
+    Menulis file berukuran size_bytes dengan entropi tertentu.
+    Checksum SHA-256 dihitung sambil menulis (tanpa membaca ulang file).
+    Mengembalikan hex digest SHA-256.
+    """
+    if not 0.0 <= entropy <= 1.0:
+        raise ValueError("entropy harus di antara 0.0 dan 1.0")
+    rng = random.Random(seed)
+    hasher = hashlib.sha256()
+    remaining = size_bytes
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        while remaining > 0:
+            block = _block_content(rng, min(BLOCK_SIZE, remaining), entropy)
+            hasher.update(block)
+            f.write(block)
+            remaining -= len(block)
+    os.replace(tmp_path, path)
+    return hasher.hexdigest()
+
+
+def _ensure_in_manifest(manifest, name, size_bytes, entropy, seed, corpus_dir):
+    """
+    Memakai ulang file dari cache jika entri manifest cocok dengan parameter
+    dan ukuran/mtime file di disk; jika tidak, file dibuat ulang dan entri
+    manifest diperbarui. Mengembalikan (path, sha256, manifest_berubah).
+    """
+    path = os.path.join(corpus_dir, name)
+    params = {'size': size_bytes, 'entropy': entropy, 'seed': seed}
+    entry = manifest.get(name)
+    if entry and all(entry.get(k) == v for k, v in params.items()):
+        try:
+            st = os.stat(path)
+            if st.st_size == size_bytes and st.st_mtime == entry.get('mtime'):
+                return path, entry['sha256'], False
+        except OSError:
+            pass
+
+    logging.warning(f"Membuat file corpus '{name}' ({size_bytes} byte, entropi {entropy}).")
+    sha256 = generate_file(path, size_bytes, entropy, seed)
+    manifest[name] = dict(params, sha256=sha256, mtime=os.stat(path).st_mtime)
+    return path, sha256, True
+
+
+def ensure_file(name, size_bytes, entropy=1.0, seed=0, corpus_dir=CORPUS_DIR):
+    """
+    Mengembalikan (path, sha256) untuk file corpus dengan parameter tertentu,
+    membuatnya hanya jika belum ada di cache.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    with _manifest_lock:
+        manifest = load_manifest(corpus_dir)
+        path, sha256, changed = _ensure_in_manifest(manifest, name, size_bytes, entropy, seed, corpus_dir)
+        if changed:
+            save_manifest(manifest, corpus_dir)
+    return path, sha256
+
+
+def size_distribution(profile, count, max_size_bytes, seed=0):
+    """
+    Menghasilkan daftar ukuran file (byte) sesuai profil:
+    - uniform    : semua file berukuran max_size_bytes
+    - many_small : log-normal di sekitar 16 KB, dibatasi max_size_bytes
+    - mixed      : ~95% file kecil (log-normal 4 KB - 1 MB) dan ~5% file
+                   besar berukuran max_size_bytes (minimal satu file besar)
+    """
+    rng = random.Random(seed)
+    if profile == 'uniform':
+        return [max_size_bytes] * count
+    if profile == 'many_small':
+        return [min(max_size_bytes, max(1, int(rng.lognormvariate(math.log(16 * 1024), 1.0))))
+                for _ in range(count)]
+    if profile == 'mixed':
+        huge_count = max(1, count // 20)
+        sizes = [max_size_bytes] * huge_count
+        for _ in range(count - huge_count):
+            small = int(rng.lognormvariate(math.log(64 * 1024), 1.2))
+            sizes.append(min(1024 * 1024, max(4 * 1024, small)))
+        rng.shuffle(sizes)
+        return sizes
+    raise ValueError(f"Profil ukuran tidak dikenal: {profile} (pilihan: {', '.join(SIZE_PROFILES)})")
+
+
+def build_corpus(profile, count, max_size_bytes, entropy=1.0, seed=0, corpus_dir=CORPUS_DIR):
+    """
+    Membuat (atau memakai ulang dari cache) sekumpulan file corpus.
+    Mengembalikan list dictionary: name, path, size, sha256.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = []
+    with _manifest_lock:
+        manifest = load_manifest(corpus_dir)
+        changed = False
+        for i, size in enumerate(size_distribution(profile, count, max_size_bytes, seed)):
+            name = f"corpus_{profile}_{i:05d}_e{int(entropy * 100):03d}.bin"
+            path, sha256, created = _ensure_in_manifest(manifest, name, size, entropy, seed + i, corpus_dir)
+            changed = changed or created
+            corpus.append(dict(name=name, path=path, size=size, sha256=sha256))
+        if changed:
+            save_manifest(manifest, corpus_dir)
+    return corpus
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for item in build_corpus('mixed', 20, 8 * 1024 * 1024, entropy=0.5):
+        print(f"{item['name']}: {item['size']} byte, sha256={item['sha256']}")
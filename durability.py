@@ -0,0 +1,208 @@
+import ctypes
+import logging
+import os
+import sys
+import threading
+
+import tracing
+
+"""
+* durability.py menentukan kapan UPLOAD yang sudah dijawab OK benar-benar
+  aman di disk (tetap ada walaupun server/mesin mati mendadak).
+
+* Mode yang tersedia (opsi --durability di server):
+  - none  : perilaku lama. Data hanya sampai di page cache; upload yang
+            sudah dijawab OK bisa hilang jika mesin crash.
+  - fsync : setiap commit melakukan fsync file sementara, rename ke lokasi
+            akhir, lalu fsync direktori yang berubah. Aman, tetapi setiap
+            upload kecil membayar beberapa fsync sendiri.
+  - group : group commit. Commit yang datang bersamaan dikumpulkan menjadi
+            satu batch; satu thread (leader) menyinkronkan data seluruh batch,
+            melakukan semua rename, lalu menyinkronkan metadata sekali untuk
+            semua. Commit yang datang selama sinkronisasi berjalan menunggu
+            batch berikutnya. Setiap pemanggil baru kembali (dan UPLOAD baru
+            dijawab) setelah batch-nya durable.
+
+* Di Linux mode group memakai syncfs(2) pada filesystem penyimpanan: satu
+  panggilan menyinkronkan seluruh batch, berapa pun jumlah filenya. Jika
+  syncfs tidak tersedia, leader melakukan fsync per file lalu fsync setiap
+  direktori yang berubah cukup sekali per batch.
+
+* Sidecar .meta tidak di-fsync sebelum rename: jika isinya rusak setelah
+  crash, sidecar dianggap tidak valid dan checksum dihitung ulang.
+"""
+
+DURABILITY_MODES = ('none', 'fsync', 'group')
+DEFAULT_DURABILITY = 'none'
+
+
+def _load_syncfs():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        syncfs = libc.syncfs
+    except (OSError, AttributeError):
+        return None
+    syncfs.argtypes = [ctypes.c_int]
+    syncfs.restype = ctypes.c_int
+    return syncfs
+
+
+_syncfs = _load_syncfs()
+
+
+def fsync_path(path):
+    """
+    fsync file (atau direktori) berdasarkan path.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def syncfs_path(path):
+    """
+    Menyinkronkan seluruh filesystem tempat 'path' berada (Linux).
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if _syncfs(fd) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+    finally:
+        os.close(fd)
+
+
+def makedirs(path):
+    """
+    Seperti os.makedirs(exist_ok=True), tetapi mengembalikan direktori induk
+    yang isinya berubah karena direktori baru dibuat (perlu ikut disinkronkan
+    pada commit).
+    """
+    created = []
+    while not os.path.isdir(path):
+        created.append(path)
+        path = os.path.dirname(path)
+    if created:
+        os.makedirs(created[0], exist_ok=True)
+    return [os.path.dirname(d) for d in created]
+
+
+class _CommitJob:
+    __slots__ = ('tmp_path', 'publish', 'dirs', 'done', 'value', 'error')
+
+    def __init__(self, tmp_path, publish, dirs):
+        self.tmp_path = tmp_path
+        self.publish = publish
+        self.dirs = dirs
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Durability:
+    """
+    Dipakai bersama oleh semua FileInterface di satu proses server agar commit
+    dari koneksi yang berbeda bisa digabung dalam satu batch.
+    """
+    def __init__(self, mode=DEFAULT_DURABILITY, use_syncfs=True):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Mode durability tidak dikenal: {mode}")
+        self.mode = mode
+        self.use_syncfs = use_syncfs and _syncfs is not None
+
+        self.cond = threading.Condition()
+        self.pending = [] # commit yang menunggu batch berikutnya
+        self.syncing = False # True selama ada leader yang sedang memproses batch
+
+    def commit(self, tmp_path, publish, dirs=()):
+        """
+        Menjadikan file sementara 'tmp_path' durable lalu memanggil publish()
+        (rename ke lokasi akhir, menulis sidecar) dan memastikan perubahan
+        direktori 'dirs' juga durable. Mengembalikan hasil publish().
+        """
+        if self.mode == 'none':
+            return publish()
+        if self.mode == 'fsync':
+            with tracing.span('fsync'):
+                fsync_path(tmp_path)
+                value = publish()
+                for d in dict.fromkeys(dirs):
+                    fsync_path(d)
+            return value
+        return self._group_commit(_CommitJob(tmp_path, publish, dirs))
+
+    def _group_commit(self, job):
+        with self.cond:
+            self.pending.append(job)
+            while not job.done and self.syncing:
+                self.cond.wait()
+            if job.done:
+                return job.result()
+            # Tidak ada batch yang sedang berjalan: thread ini menjadi leader
+            # untuk semua commit yang sudah menunggu (termasuk miliknya sendiri).
+            self.syncing = True
+            batch, self.pending = self.pending, []
+        try:
+            with tracing.span('group_commit', batch=len(batch)):
+                self._run_batch(batch)
+        finally:
+            with self.cond:
+                for other in batch:
+                    other.done = True
+                self.syncing = False
+                self.cond.notify_all()
+        return job.result()
+
+    def _run_batch(self, batch):
+        try:
+            self._sync([job.tmp_path for job in batch], ())
+        except OSError as e:
+            logging.error(f"Sinkronisasi data batch commit gagal: {e}")
+            for job in batch:
+                job.error = e
+            return
+
+        published = []
+        for job in batch:
+            try:
+                job.value = job.publish()
+                published.append(job)
+            except Exception as e:
+                job.error = e
+        if not published:
+            return
+
+        try:
+            self._sync((), [d for job in published for d in job.dirs])
+        except OSError as e:
+            logging.error(f"Sinkronisasi direktori batch commit gagal: {e}")
+            for job in published:
+                job.error = e
+
+    def _sync(self, files, dirs):
+        if self.use_syncfs:
+            # Semua file satu server berada di filesystem yang sama (storage_dir)
+            syncfs_path(files[0] if files else dirs[0])
+            return
+        for path in files:
+            fsync_path(path)
+        for d in dict.fromkeys(dirs):
+            fsync_path(d)
+
+
+def add_durability_args(parser):
+    parser.add_argument('--durability', choices=DURABILITY_MODES, default=DEFAULT_DURABILITY,
+                        help="kapan UPLOAD dianggap aman di disk sebelum dijawab (lihat durability.py)")
+
+
+def durability_from_args(args):
+    return Durability(args.durability)
@@ -5,6 +5,14 @@ import logging
 import os
 import sys
 import time # Import modul time untuk delay
+import hashlib
+import random
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from stream_codec import b64decode_hashed
+from hash_ring import HashRing, parse_node, DEFAULT_VNODES
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.WARNING, # Ubah ke WARNING agar tidak terlalu banyak log saat stress test
@@ -105,10 +113,15 @@ def remote_list(sock, client_id=None): # Tambahkan client_id
         logging.debug(f"{client_prefix}LIST berhasil.")
         return True
     else:
-        logging.error(f"{client_prefix}Gagal LIST: {hasil.get('data', 'Unknown error')}")
+        logging.error(f"{client_prefix}Gagal LIST: {hasil.get('data', 'Unknown error') if hasil else 'tidak ada respons'}")
         return False
 
-def remote_get(sock, filename="", client_id=None): # Tambahkan client_id
+def remote_get(sock, filename="", client_id=None, expected_sha256=None): # Tambahkan client_id
+    """
+    Mengunduh file dari server. Isi file di-decode per chunk sambil dihitung
+    SHA-256-nya lalu dibandingkan dengan expected_sha256 (jika diberikan) atau
+    checksum yang dikirim server (data_sha256); jika tidak cocok, GET dianggap gagal.
+    """
     client_prefix = f"(Client {client_id}) " if client_id is not None else ""
     command_dict = {"command": "GET", "params": [filename]}
     hasil = send_command_persistent(sock, command_dict, client_id=client_id)
@@ -120,14 +133,27 @@ def remote_get(sock, filename="", client_id=None): # Tambahkan client_id
         return False
     # --- END OF CRITICAL FIX ---
 
+    return check_get_response(hasil, expected_sha256, client_prefix)
+
+def check_get_response(hasil, expected_sha256=None, client_prefix=""):
+    """
+    Memeriksa respons GET: status OK, field lengkap, dan checksum isi file cocok.
+    """
     if hasil and hasil.get('status') == 'OK':
         namafile = hasil.get('data_namafile')
         isifile_b64 = hasil.get('data_file')
         if namafile and isifile_b64:
             try:
-                isifile = base64.b64decode(isifile_b64)
                 # Untuk stress testing, umumnya kita tidak menyimpan file yang diunduh
-                # untuk menghindari bottleneck I/O di sisi klien, kecuali jika verifikasi diperlukan.
+                # untuk menghindari bottleneck I/O di sisi klien. Hash dihitung pada
+                # setiap chunk hasil decode, jadi verifikasi tidak butuh pass tambahan.
+                hasher = hashlib.sha256()
+                b64decode_hashed(isifile_b64, hasher)
+                expected_sha256 = expected_sha256 or hasil.get('data_sha256')
+                if expected_sha256 and hasher.hexdigest() != expected_sha256:
+                    logging.error(f"{client_prefix}Checksum file '{namafile}' tidak cocok: "
+                                  f"{hasher.hexdigest()} != {expected_sha256}.")
+                    return False
                 logging.debug(f"{client_prefix}GET file '{namafile}' berhasil.")
                 return True
             except Exception as e:
@@ -143,6 +169,133 @@ def remote_get(sock, filename="", client_id=None): # Tambahkan client_id
         logging.error(f"{client_prefix}Gagal GET: {hasil.get('data', 'Unknown error')}. Status: {hasil.get('status', 'N/A')}")
         return False
 
+def remote_stat(sock, filename="", client_id=None):
+    """
+    Meminta metadata file (data_size, data_mtime_ns, data_sha256) tanpa mengunduh isinya.
+    Mengembalikan dictionary respons server atau False jika gagal.
+    """
+    client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+    command_dict = {"command": "STAT", "params": [filename]}
+    hasil = send_command_persistent(sock, command_dict, client_id=client_id)
+    if hasil and hasil.get('status') == 'OK':
+        logging.debug(f"{client_prefix}STAT file '{filename}' berhasil.")
+        return hasil
+    logging.error(f"{client_prefix}Gagal STAT: {hasil.get('data', 'Unknown error') if hasil else 'tidak ada respons'}")
+    return False
+
+def local_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def remote_sync_file(sock, filename, local_path, client_id=None):
+    """
+    Memastikan local_path berisi versi terbaru file 'filename' di server.
+    Jika checksum file lokal sama dengan checksum di server, unduhan dilewati.
+    Mengembalikan 'unchanged', 'downloaded', atau False jika gagal.
+    """
+    client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+    stat = remote_stat(sock, filename, client_id=client_id)
+    if not stat:
+        return False
+    if os.path.exists(local_path) and local_sha256(local_path) == stat.get('data_sha256'):
+        logging.debug(f"{client_prefix}File '{filename}' sudah terbaru, unduhan dilewati.")
+        return 'unchanged'
+
+    hasil = send_command_persistent(sock, {"command": "GET", "params": [filename]}, client_id=client_id)
+    if not hasil or hasil.get('status') != 'OK':
+        logging.error(f"{client_prefix}Gagal GET: {hasil.get('data', 'Unknown error') if hasil else 'tidak ada respons'}")
+        return False
+    hasher = hashlib.sha256()
+    tmp_path = local_path + '.part'
+    with open(tmp_path, 'wb') as out:
+        b64decode_hashed(hasil['data_file'], hasher, out=out)
+    if hasher.hexdigest() != hasil.get('data_sha256'):
+        os.remove(tmp_path)
+        logging.error(f"{client_prefix}Checksum file '{filename}' tidak cocok, unduhan dibuang.")
+        return False
+    os.replace(tmp_path, local_path)
+    return 'downloaded'
+
+class DownloadCache:
+    """
+    Cache file hasil unduhan di disk lokal. Isi file disimpan per checksum
+    (objects/<sha256>) dan index.json memetakan nama file ke versi (sha256, size)
+    terakhir yang diketahui. Aman dipakai bersama oleh beberapa thread.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256)
+
+    def lookup(self, filename):
+        """
+        Entri cache untuk filename jika isinya masih ada di disk, selain itu None.
+        """
+        with self.lock:
+            entry = self.index.get(filename)
+        if entry and os.path.exists(self.object_path(entry['sha256'])):
+            return entry
+        return None
+
+    def new_temp_file(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def store(self, filename, sha256, size, tmp_path):
+        os.replace(tmp_path, self.object_path(sha256))
+        with self.lock:
+            self.index[filename] = dict(sha256=sha256, size=size)
+            fd, index_tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.index')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.index, f)
+            os.replace(index_tmp, self.index_path)
+        return self.object_path(sha256)
+
+def remote_get_cached(sock, filename, cache, client_id=None):
+    """
+    GET dengan cache lokal. Jika nama file sudah ada di cache, checksum-nya dikirim
+    sebagai PARAMETER2; server menjawab NOT_MODIFIED tanpa mengirim isi file jika
+    versinya masih sama. Mengembalikan path file di cache, atau False jika gagal.
+    """
+    client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+    entry = cache.lookup(filename)
+    params = [filename, entry['sha256']] if entry else [filename]
+    hasil = send_command_persistent(sock, {"command": "GET", "params": params}, client_id=client_id)
+    if hasil is False:
+        logging.error(f"{client_prefix}Gagal menerima respons GET dari server.")
+        return False
+
+    if hasil.get('status') == 'NOT_MODIFIED':
+        logging.debug(f"{client_prefix}File '{filename}' tidak berubah, memakai cache.")
+        return cache.object_path(entry['sha256'])
+    if hasil.get('status') != 'OK' or not hasil.get('data_file'):
+        logging.error(f"{client_prefix}Gagal GET: {hasil.get('data', 'Unknown error')}. Status: {hasil.get('status', 'N/A')}")
+        return False
+
+    hasher = hashlib.sha256()
+    out, tmp_path = cache.new_temp_file()
+    with out:
+        size = b64decode_hashed(hasil['data_file'], hasher, out=out)
+    sha256 = hasher.hexdigest()
+    if hasil.get('data_sha256') and sha256 != hasil['data_sha256']:
+        os.remove(tmp_path)
+        logging.error(f"{client_prefix}Checksum file '{filename}' tidak cocok, tidak disimpan ke cache.")
+        return False
+    return cache.store(filename, sha256, size, tmp_path)
+
 def remote_upload(sock, filename="", client_id=None): # Tambahkan client_id
     client_prefix = f"(Client {client_id}) " if client_id is not None else ""
     
@@ -177,6 +330,79 @@ def remote_upload(sock, filename="", client_id=None): # Tambahkan client_id
         logging.error(f"{client_prefix}Error saat upload di remote_upload: {e}", exc_info=True)
         return False
 
+def remote_multipart_upload(server_address, filename, part_size=8 * 1024 * 1024, connections=4, client_id=None):
+    """
+    Upload file besar secara paralel: file dipecah menjadi part berukuran part_size
+    yang dikirim lewat 'connections' koneksi sekaligus, lalu server menggabungkannya
+    secara atomik saat MULTIPART_COMMIT. Jika ada part yang gagal, upload dibatalkan.
+    """
+    client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+    if not os.path.exists(filename):
+        logging.error(f"{client_prefix}File '{filename}' tidak ditemukan secara lokal.")
+        return False
+
+    control = connect_to_server(server_address)
+    if control is None:
+        return False
+    local_state = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+
+    def part_socket():
+        sock = getattr(local_state, 'sock', None)
+        if sock is None:
+            sock = connect_to_server(server_address)
+            local_state.sock = sock
+            with opened_lock:
+                opened.append(sock)
+        return sock
+
+    def send_part(upload_id, part_number, offset):
+        with open(filename, 'rb') as fp:
+            fp.seek(offset)
+            chunk = fp.read(part_size)
+        sha256 = hashlib.sha256(chunk).hexdigest()
+        command = {"command": "MULTIPART_PART",
+                   "params": [upload_id, part_number, base64.b64encode(chunk).decode('utf-8')]}
+        hasil = send_command_persistent(part_socket(), command, client_id=client_id)
+        if not hasil or hasil.get('status') != 'OK' or hasil.get('data_sha256') != sha256:
+            raise RuntimeError(f"part {part_number} gagal: {hasil.get('data') if hasil else 'tidak ada respons'}")
+        return {"part": part_number, "sha256": sha256}
+
+    upload_id = None
+    try:
+        hasil = send_command_persistent(control, {"command": "MULTIPART_INIT",
+                                                  "params": [os.path.basename(filename)]}, client_id=client_id)
+        if not hasil or hasil.get('status') != 'OK':
+            logging.error(f"{client_prefix}MULTIPART_INIT gagal: {hasil.get('data') if hasil else 'tidak ada respons'}")
+            return False
+        upload_id = hasil['data_upload_id']
+
+        file_size = os.path.getsize(filename)
+        offsets = range(0, max(file_size, 1), part_size)
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            parts = list(executor.map(lambda args: send_part(upload_id, *args),
+                                      [(i + 1, offset) for i, offset in enumerate(offsets)]))
+
+        hasil = send_command_persistent(control, {"command": "MULTIPART_COMMIT", "params": [upload_id, parts]},
+                                        client_id=client_id)
+        if not hasil or hasil.get('status') != 'OK':
+            logging.error(f"{client_prefix}MULTIPART_COMMIT gagal: {hasil.get('data') if hasil else 'tidak ada respons'}")
+            return False
+        upload_id = None # sudah di-commit, tidak perlu abort
+        logging.debug(f"{client_prefix}Multipart upload '{os.path.basename(filename)}' berhasil ({len(parts)} part).")
+        return True
+    except Exception as e:
+        logging.error(f"{client_prefix}Error saat multipart upload: {e}")
+        return False
+    finally:
+        if upload_id is not None:
+            send_command_persistent(control, {"command": "MULTIPART_ABORT", "params": [upload_id]}, client_id=client_id)
+        control.close()
+        for sock in opened:
+            if sock is not None:
+                sock.close()
+
 def remote_delete(sock, filename="", client_id=None): # Tambahkan client_id
     client_prefix = f"(Client {client_id}) " if client_id is not None else ""
     command_dict = {"command": "DELETE", "params": [filename]}
@@ -185,9 +411,25 @@ def remote_delete(sock, filename="", client_id=None): # Tambahkan client_id
         logging.debug(f"{client_prefix}DELETE file '{filename}' berhasil.")
         return True
     else:
-        logging.error(f"{client_prefix}Delete gagal: {hasil.get('data', 'Unknown error')}")
+        logging.error(f"{client_prefix}Delete gagal: {hasil.get('data', 'Unknown error') if hasil else 'tidak ada respons'}")
         return False
 
+def remote_trace_dump(sock, out_path, clear=False, client_id=None):
+    """
+    Mengambil ring buffer tracing server (TRACE_DUMP) dan menyimpannya sebagai
+    Chrome trace JSON di out_path (buka di chrome://tracing atau ui.perfetto.dev).
+    """
+    client_prefix = f"(Client {client_id}) " if client_id is not None else ""
+    command_dict = {"command": "TRACE_DUMP", "params": ['clear'] if clear else []}
+    hasil = send_command_persistent(sock, command_dict, client_id=client_id)
+    if hasil and hasil.get('status') == 'OK':
+        with open(out_path, 'w') as f:
+            json.dump(hasil['data_trace'], f)
+        logging.debug(f"{client_prefix}Trace disimpan ke '{out_path}'.")
+        return True
+    logging.error(f"{client_prefix}TRACE_DUMP gagal: {hasil.get('data', 'Unknown error') if hasil else 'tidak ada respons'}")
+    return False
+
 def generate_binary_file(filename, size_in_mb):
     """
     Menggenerate file biner dengan ukuran tertentu (dalam MB).
@@ -205,3 +447,174 @@ def generate_binary_file(filename, size_in_mb):
     except Exception as e:
         logging.error(f"Gagal membuat file biner: {e}")
         return False
+
+class _NodeSockets:
+    """
+    Satu koneksi persistent per node "host:port", dibuka saat pertama kali dibutuhkan.
+    """
+    def __init__(self, client_id=None):
+        self.client_id = client_id
+        self.sockets = {}
+
+    def _sock(self, node):
+        sock = self.sockets.get(node)
+        if sock is None:
+            sock = connect_to_server(parse_node(node))
+            if sock is not None:
+                self.sockets[node] = sock
+        return sock
+
+    def _done(self, node, ok):
+        # Jika operasi gagal, state socket tidak pasti (bisa masih ada sisa respons):
+        # buang koneksinya agar panggilan berikutnya membuka koneksi baru.
+        if not ok and node in self.sockets:
+            self.sockets.pop(node).close()
+        return ok
+
+    def close(self):
+        for sock in self.sockets.values():
+            sock.close()
+        self.sockets = {}
+
+class ClusterClient(_NodeSockets):
+    """
+    Klien routing untuk mode cluster: beberapa file server, masing-masing dengan
+    storage_dir sendiri. Pemilik setiap nama file ditentukan oleh HashRing;
+    GET/UPLOAD/DELETE/STAT dikirim ke node pemilik, LIST dikirim ke semua node
+    lalu hasilnya digabung.
+    Satu koneksi persistent dibuka per node (lazy). Tidak thread-safe: gunakan
+    satu ClusterClient per thread.
+    """
+    def __init__(self, nodes, vnodes=DEFAULT_VNODES, client_id=None):
+        _NodeSockets.__init__(self, client_id)
+        self.ring = HashRing(nodes, vnodes=vnodes)
+
+    def node_for(self, filename):
+        return self.ring.get_node(filename)
+
+    def get(self, filename, expected_sha256=None):
+        node = self.node_for(filename)
+        return self._done(node, remote_get(self._sock(node), filename, client_id=self.client_id,
+                                           expected_sha256=expected_sha256))
+
+    def upload(self, local_path):
+        node = self.node_for(os.path.basename(local_path))
+        return self._done(node, remote_upload(self._sock(node), local_path, client_id=self.client_id))
+
+    def delete(self, filename):
+        node = self.node_for(filename)
+        return self._done(node, remote_delete(self._sock(node), filename, client_id=self.client_id))
+
+    def stat(self, filename):
+        node = self.node_for(filename)
+        return self._done(node, remote_stat(self._sock(node), filename, client_id=self.client_id))
+
+    def list(self):
+        """
+        LIST ke semua node secara paralel (masing-masing lewat koneksinya sendiri),
+        sehingga latensinya tidak bertambah dengan jumlah node. Mengembalikan
+        dictionary nama file -> dict(node, sha256), atau False jika ada node yang
+        gagal dihubungi (hasil parsial tidak dianggap valid).
+        """
+        def list_node(node):
+            hasil = send_command_persistent(self._sock(node), {"command": "LIST", "params": []},
+                                            client_id=self.client_id)
+            return hasil if self._done(node, bool(hasil) and hasil.get('status') == 'OK') else None
+
+        nodes = list(self.ring.nodes)
+        with ThreadPoolExecutor(max_workers=max(1, len(nodes))) as executor:
+            listings = list(executor.map(list_node, nodes))
+        merged = {}
+        for node, hasil in zip(nodes, listings):
+            if hasil is None:
+                logging.error(f"LIST ke node {node} gagal.")
+                return False
+            checksums = hasil.get('data_checksums', {})
+            for name in hasil['data']:
+                merged[name] = dict(node=node, sha256=checksums.get(name))
+        return merged
+
+class ReplicaClient(_NodeSockets):
+    """
+    Klien untuk sekumpulan server replika (server dijalankan dengan --peers satu sama lain).
+    GET disebar ke replika yang sehat berdasarkan latensi yang teramati (EWMA),
+    memakai "power of two choices": dua replika dipilih acak lalu yang lebih cepat
+    dipakai, sehingga file yang populer tidak selalu membebani satu node.
+    UPLOAD dan DELETE dikirim ke node pertama yang sehat (server itu yang mereplikasi ke peer).
+    Tidak thread-safe: gunakan satu ReplicaClient per thread.
+    """
+    def __init__(self, nodes, client_id=None, alpha=0.3, cooldown=5.0):
+        _NodeSockets.__init__(self, client_id)
+        self.nodes = list(nodes)
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.latency = {node: None for node in self.nodes} # EWMA latensi (detik)
+        self.unhealthy_until = {node: 0 for node in self.nodes}
+
+    def _healthy(self):
+        now = time.monotonic()
+        healthy = [n for n in self.nodes if self.unhealthy_until[n] <= now]
+        return healthy or list(self.nodes) # jika semua ditandai gagal, coba semuanya lagi
+
+    def _score(self, node):
+        # Node yang belum pernah diukur diberi skor 0 agar ikut dicoba
+        return self.latency[node] or 0.0
+
+    def read_order(self):
+        """
+        Urutan replika untuk GET: pemenang power-of-two-choices lebih dulu,
+        lalu sisanya berdasarkan latensi sebagai fallback.
+        """
+        healthy = self._healthy()
+        rest = sorted(healthy, key=self._score)
+        if len(healthy) >= 2:
+            a, b = random.sample(healthy, 2)
+            first = a if self._score(a) <= self._score(b) else b
+            rest.remove(first)
+            return [first] + rest
+        return rest
+
+    def _observe(self, node, elapsed, transport_ok):
+        if not transport_ok:
+            self.unhealthy_until[node] = time.monotonic() + self.cooldown
+            return
+        old = self.latency[node]
+        self.latency[node] = elapsed if old is None else (1 - self.alpha) * old + self.alpha * elapsed
+
+    def get(self, filename, expected_sha256=None):
+        client_prefix = f"(Client {self.client_id}) " if self.client_id is not None else ""
+        for node in self.read_order():
+            start = time.monotonic()
+            hasil = send_command_persistent(self._sock(node), {"command": "GET", "params": [filename]},
+                                            client_id=self.client_id)
+            self._observe(node, time.monotonic() - start, hasil is not False)
+            if hasil is False:
+                self._done(node, False)
+                continue
+            if hasil.get('status') != 'OK':
+                # Misalnya replikasi async belum sampai ke node ini: coba replika lain
+                logging.warning(f"{client_prefix}GET '{filename}' di {node} gagal: {hasil.get('data')}")
+                continue
+            return check_get_response(hasil, expected_sha256, client_prefix)
+        return False
+
+    def upload(self, local_path):
+        for node in self._healthy():
+            sock = self._sock(node)
+            if sock is None:
+                self._observe(node, 0, False)
+                continue
+            return self._done(node, remote_upload(sock, local_path, client_id=self.client_id))
+        return False
+
+    def delete(self, filename):
+        """
+        DELETE dikirim ke node pertama yang sehat; server itu yang meneruskannya ke peer.
+        """
+        for node in self._healthy():
+            sock = self._sock(node)
+            if sock is None:
+                self._observe(node, 0, False)
+                continue
+            return self._done(node, remote_delete(sock, filename, client_id=self.client_id))
+        return False
@@ -1,11 +1,164 @@
 import os
 import json
-import base64
-from glob import glob
+import hashlib
+import tempfile
+import unicodedata
+import shutil
+import time
+import uuid
 import logging # Tambahkan logging untuk membantu debugging
 
+from stream_codec import b64decode_hashed, Base64StreamDecoder, Base64FileBody
+from durability import Durability, makedirs
+import tracing
+
+# Sidecar metadata (ukuran, mtime, SHA-256) disimpan di subdirektori tersembunyi
+# agar tidak ikut terdaftar oleh LIST.
+META_DIRNAME = '.meta'
+TMP_DIRNAME = '.tmp'
+MULTIPART_DIRNAME = '.multipart'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Multipart upload: batas jumlah part dan umur upload yang belum di-commit
+MAX_MULTIPART_PARTS = 10000
+MULTIPART_TTL = 24 * 3600
+
+# Layout penyimpanan: file disebar ke subdirektori berdasarkan hash nama,
+# misalnya 'foto.jpg' -> files/3f/a2/foto.jpg. Dengan 2 level x 2 karakter hex
+# ada 65536 direktori, sehingga satu direktori tetap kecil walaupun jumlah
+# file mencapai jutaan. Direktori lama yang masih flat bisa dipindahkan
+# dengan migrate_storage.py.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+MAX_FILENAME_BYTES = 240 # sisakan ruang untuk akhiran '.json' sidecar (batas umum 255 byte)
+
+
+def normalize_filename(filename):
+    """
+    Normalisasi dan validasi nama file dari klien. Nama dinormalisasi ke
+    Unicode NFC dan harus berupa satu komponen path: tanpa '/', '\\', NUL,
+    dan bukan '.' atau '..', sehingga tidak bisa keluar dari storage_dir.
+    """
+    if not isinstance(filename, str):
+        raise ValueError("Filename must be a string.")
+    filename = unicodedata.normalize('NFC', filename)
+    if filename in ('', '.', '..'):
+        raise ValueError(f"Invalid filename '{filename}'.")
+    if '/' in filename or '\\' in filename or '\0' in filename:
+        raise ValueError(f"Invalid filename '{filename}': path separators are not allowed.")
+    if len(filename.encode('utf-8')) > MAX_FILENAME_BYTES:
+        raise ValueError(f"Filename too long (max {MAX_FILENAME_BYTES} bytes).")
+    return filename
+
+
+def shard_dirs(filename):
+    """
+    Komponen subdirektori shard untuk nama file (yang sudah dinormalisasi).
+    """
+    digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    return [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+
+
+def is_listed_name(name):
+    """
+    LIST hanya menampilkan nama dengan pola '*.*' seperti layout flat sebelumnya
+    (tidak diawali titik dan mengandung titik).
+    """
+    return not name.startswith('.') and '.' in name
+
+class StreamingUpload:
+    """
+    UPLOAD yang payload base64-nya datang sepotong-sepotong saat data tiba dari
+    socket. Setiap potongan langsung di-decode ke file sementara sambil
+    menghitung SHA-256; finish() menyimpan file dan mengembalikan dictionary
+    respons. Error di tengah payload (misalnya base64 tidak valid) hanya dicatat
+    dan sisa payload diabaikan, sehingga respons ERROR dikirim setelah seluruh
+    frame terbaca dan koneksi tetap bisa dipakai.
+
+    Upload diproses dalam beberapa giliran worker (bisa di thread berbeda), jadi
+    saat tracing aktif fase recv dan decode_write setiap potongan dikumpulkan di
+    trace_phases dan dicatat oleh request span di finish_upload (atau abort()).
+    """
+    def __init__(self, file_interface, filename):
+        self.file_interface = file_interface
+        self.filename = filename
+        self.hasher = hashlib.sha256()
+        self.decoder = Base64StreamDecoder()
+        self.size = 0
+        self.fp = None
+        self.tmp_path = None
+        self.error = None
+        self.trace_start = self.trace_phases = self.fed_at = None
+        if tracing.enabled():
+            self.trace_start = self.fed_at = time.perf_counter()
+            self.trace_phases = tracing.take_phases()
+        try:
+            if not filename:
+                raise ValueError("Filename cannot be empty.")
+            self.filename = normalize_filename(filename)
+            fd, self.tmp_path = tempfile.mkstemp(dir=file_interface.tmp_dir, suffix='.upload')
+            self.fp = os.fdopen(fd, 'wb')
+        except Exception as e:
+            self.error = e
+
+    def feed(self, data):
+        if self.error is not None:
+            return
+        start = time.perf_counter() if self.trace_phases is not None else None
+        try:
+            decoded = self.decoder.feed(data)
+            self.hasher.update(decoded)
+            self.fp.write(decoded)
+            self.size += len(decoded)
+        except Exception as e:
+            self.error = e
+        if start is not None:
+            # recv: sejak potongan sebelumnya selesai (menunggu data klien dan giliran worker)
+            end = time.perf_counter()
+            self.trace_phases.append(('recv', self.fed_at, start, {'bytes': len(data)}))
+            self.trace_phases.append(('decode_write', start, end, {'bytes': len(decoded) if self.error is None else 0}))
+            self.fed_at = end
+
+    def finish(self):
+        try:
+            if self.error is not None:
+                raise self.error
+            self.decoder.finish()
+            self.fp.close()
+            if self.size == 0:
+                raise ValueError("Filename or file data cannot be empty.")
+            sha256 = self.hasher.hexdigest()
+            with tracing.span('commit'):
+                self.file_interface._commit_file(self.filename, self.tmp_path, sha256)
+            logging.info(f"Successfully uploaded file '{self.filename}' (streaming).")
+            return dict(status='OK', data=f"{self.filename} uploaded", data_sha256=sha256)
+        except Exception as e:
+            logging.error(f"Error uploading file '{self.filename}': {e}")
+            self._discard()
+            return dict(status='ERROR', data=str(e))
+
+    def abort(self):
+        """
+        Membatalkan upload karena koneksi putus sebelum frame selesai.
+        """
+        self._discard()
+        if self.trace_phases is not None:
+            with tracing.request('request', start=self.trace_start, phases=self.trace_phases,
+                                 command='upload', streaming=True, bytes=self.size, aborted=True):
+                pass
+
+    def _discard(self):
+        """
+        Membuang file sementara (koneksi putus atau upload gagal).
+        """
+        if self.fp is not None:
+            self.fp.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
 class FileInterface:
-    def __init__(self):
+    def __init__(self, storage_dir=None, durability=None):
         # --- INI ADALAH PERUBAHAN STRUKTURAL YANG PENTING ---
         # Dapatkan direktori tempat skrip file_interface.py ini dijalankan.
         # Ini memberikan titik referensi yang stabil untuk jalur file,
@@ -14,11 +167,25 @@ class FileInterface:
         
         # Buat jalur lengkap ke folder 'files' di dalam direktori skrip.
         # Ini akan menjadi lokasi penyimpanan file yang konsisten.
-        self.storage_dir = os.path.join(self.base_dir, 'files')
+        # storage_dir dapat di-override (misalnya oleh benchmark_matrix.py
+        # yang menjalankan beberapa server dengan direktori terpisah).
+        if storage_dir:
+            self.storage_dir = os.path.abspath(storage_dir)
+        else:
+            self.storage_dir = os.path.join(self.base_dir, 'files')
 
         # Pastikan direktori penyimpanan ada.
         # Jika 'files/' belum ada di lokasi self.storage_dir, ini akan membuatnya.
         os.makedirs(self.storage_dir, exist_ok=True)
+        self.meta_dir = os.path.join(self.storage_dir, META_DIRNAME)
+        self.tmp_dir = os.path.join(self.storage_dir, TMP_DIRNAME)
+        self.multipart_dir = os.path.join(self.storage_dir, MULTIPART_DIRNAME)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.multipart_dir, exist_ok=True)
+        # durability (lihat durability.py) dipakai bersama antar handler agar
+        # commit dari koneksi berbeda bisa digabung (group commit)
+        self.durability = durability or Durability()
         logging.info(f"FileInterface initialized. Storage directory: {self.storage_dir}")
         # --- AKHIR PERUBAHAN STRUKTURAL PENTING DI __init__ ---
 
@@ -26,16 +193,138 @@ class FileInterface:
         """
         Fungsi pembantu untuk mendapatkan jalur lengkap file di dalam direktori penyimpanan.
         Ini memastikan semua operasi file menggunakan jalur yang benar dan absolut.
+        Nama file divalidasi ulang di sini sehingga tidak ada jalur yang lolos tanpa normalisasi.
+        """
+        filename = normalize_filename(filename)
+        return os.path.join(self.storage_dir, *shard_dirs(filename), filename)
+
+    def _get_meta_path(self, filename):
+        filename = normalize_filename(filename)
+        return os.path.join(self.meta_dir, *shard_dirs(filename), filename + '.json')
+
+    def _iter_filenames(self):
+        """
+        Menelusuri semua direktori shard dan menghasilkan nama logis setiap file.
+        """
+        def subdirs(path):
+            with os.scandir(path) as it:
+                return [e.path for e in it
+                        if e.is_dir(follow_symlinks=False) and len(e.name) == SHARD_WIDTH
+                        and not e.name.startswith('.')]
+
+        level = [self.storage_dir]
+        for _ in range(SHARD_LEVELS):
+            level = [d for parent in level for d in subdirs(parent)]
+        for shard in level:
+            with os.scandir(shard) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        yield entry.name
+
+    def _write_meta(self, filename, st, sha256):
+        """
+        Menyimpan sidecar metadata secara atomik (tulis ke file sementara lalu rename).
+        """
+        meta = dict(name=filename, size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=sha256)
+        meta_path = self._get_meta_path(filename)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.meta')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        return meta
+
+    def _read_meta(self, filename, st):
+        """
+        Membaca sidecar metadata; hanya dianggap valid jika ukuran dan mtime
+        masih sama dengan file di disk (file bisa saja diubah di luar server).
+        """
+        try:
+            with open(self._get_meta_path(filename)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('size') != st.st_size or meta.get('mtime_ns') != st.st_mtime_ns:
+            return None
+        return meta
+
+    def _get_meta(self, filename, compute=True):
         """
-        return os.path.join(self.storage_dir, filename)
+        Metadata file (size, mtime_ns, sha256). Untuk file tanpa sidecar yang valid
+        (misalnya file lama), checksum dihitung sekali lalu disimpan jika compute=True.
+        """
+        filepath = self._get_full_path(filename)
+        if not compute:
+            return self._read_meta(filename, os.stat(filepath))
+        with open(filepath, 'rb') as fp:
+            return self._get_open_meta(filename, fp)
+
+    def _get_open_meta(self, filename, fp):
+        """
+        Metadata file yang sudah dibuka. Sidecar dicocokkan dengan fstat file yang
+        terbuka, bukan dengan path, sehingga checksum selalu milik isi yang dibaca
+        walaupun file diganti UPLOAD/REPLICATE lain di antaranya. Jika tidak cocok,
+        checksum dihitung dari file yang terbuka; sidecar hanya disimpan jika path
+        masih menunjuk ke file yang sama.
+        """
+        st = os.fstat(fp.fileno())
+        meta = self._read_meta(filename, st)
+        if meta is not None:
+            return meta
+        hasher = hashlib.sha256()
+        offset = 0
+        while True:
+            chunk = os.pread(fp.fileno(), HASH_CHUNK_SIZE, offset) # posisi baca fp tidak berubah
+            if not chunk:
+                break
+            hasher.update(chunk)
+            offset += len(chunk)
+        sha256 = hasher.hexdigest()
+        try:
+            current = os.path.samestat(st, os.stat(self._get_full_path(filename)))
+        except OSError:
+            current = False
+        if current:
+            return self._write_meta(filename, st, sha256)
+        return dict(name=filename, size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=sha256)
+
+    def _commit_file(self, filename, tmp_path, sha256):
+        """
+        Memindahkan file sementara yang sudah lengkap ke lokasi akhirnya secara
+        atomik (rename) lalu menyimpan sidecar metadata-nya. Fungsi baru kembali
+        setelah file durable sesuai mode self.durability.
+        """
+        filepath = self._get_full_path(filename) # Dapatkan jalur lengkap file
+        file_dir = os.path.dirname(filepath)
+        meta_dir = os.path.dirname(self._get_meta_path(filename))
+        dirs = [file_dir, meta_dir] + makedirs(file_dir) + makedirs(meta_dir)
+
+        def publish():
+            # stat sebelum rename: setelah rename, path bisa saja sudah ditimpa upload lain
+            st = os.stat(tmp_path)
+            os.replace(tmp_path, filepath)
+            return self._write_meta(filename, st, sha256)
+
+        return self.durability.commit(tmp_path, publish, dirs)
 
     def list(self, params=[]):
         try:
-            # Gunakan jalur lengkap untuk mencari file di dalam direktori penyimpanan.
-            # os.path.basename digunakan untuk hanya mendapatkan nama file, bukan jalur lengkap.
-            filelist = [os.path.basename(f) for f in glob(os.path.join(self.storage_dir, '*.*'))]
+            # Telusuri direktori shard; yang dikembalikan hanya nama logis file,
+            # sama seperti saat semua file masih berada langsung di storage_dir.
+            # LIST all mengembalikan semua file tanpa filter '*.*' (dipakai cluster_rebalance.py).
+            show_all = bool(params) and params[0] == 'all'
+            filelist = sorted(name for name in self._iter_filenames() if show_all or is_listed_name(name))
             logging.info(f"Listed files: {filelist}")
-            return dict(status='OK',data=filelist)
+            # Checksum hanya diambil dari sidecar yang sudah ada (tanpa membaca isi file);
+            # None berarti checksum belum diketahui, gunakan STAT untuk menghitungnya.
+            checksums = {}
+            for name in filelist:
+                try:
+                    meta = self._get_meta(name, compute=False)
+                except (OSError, ValueError):
+                    meta = None
+                checksums[name] = meta['sha256'] if meta else None
+            return dict(status='OK',data=filelist,data_checksums=checksums)
         except Exception as e:
             logging.error(f"Error listing files: {e}")
             return dict(status='ERROR',data=str(e))
@@ -45,6 +334,7 @@ class FileInterface:
             filename = params[0]
             if not filename: # Memastikan nama file tidak kosong
                 return dict(status='ERROR', data="Filename cannot be empty.")
+            filename = normalize_filename(filename)
             
             filepath = self._get_full_path(filename) # Dapatkan jalur lengkap file
             
@@ -52,10 +342,29 @@ class FileInterface:
                 logging.warning(f"File '{filename}' not found for GET at {filepath}.")
                 return dict(status='ERROR', data=f"File '{filename}' not found.")
 
-            with open(filepath,'rb') as fp: # Buka file menggunakan jalur lengkap
-                isifile = base64.b64encode(fp.read()).decode('utf-8') # Pastikan decode ke utf-8
-            logging.info(f"Successfully read file '{filename}'.")
-            return dict(status='OK',data_namafile=filename,data_file=isifile)
+            # Isi file tidak dibaca ke memori di sini: Base64FileBody membuka file dan
+            # meng-encode-nya per chunk saat respons dikirim (lihat FileProtocol.proses_response).
+            # File dibuka sebelum metadata diambil agar checksum yang dikirim milik
+            # isi yang sama walaupun file diganti di antaranya.
+            isifile = Base64FileBody(filepath)
+            try:
+                with tracing.span('meta'):
+                    meta = self._get_open_meta(filename, isifile.fp)
+            except Exception:
+                isifile.close()
+                raise
+            # GET kondisional: PARAMETER2 (opsional) adalah SHA-256 versi yang sudah
+            # dimiliki klien. Jika masih sama, isi file tidak dibaca maupun dikirim.
+            if len(params) > 1 and params[1] == meta['sha256']:
+                isifile.close()
+                logging.info(f"File '{filename}' not modified.")
+                return dict(status='NOT_MODIFIED', data_namafile=filename,
+                            data_sha256=meta['sha256'], data_size=meta['size'])
+            logging.info(f"Successfully opened file '{filename}'.")
+            # data_file sengaja diletakkan paling akhir agar klien bisa membaca
+            # field kecil (checksum, ukuran) sebelum payload besar.
+            return dict(status='OK',data_namafile=filename,data_sha256=meta['sha256'],
+                        data_size=meta['size'],data_file=isifile)
         except IndexError: # Menangani jika parameter filename tidak ada
             logging.error("GET command missing filename parameter.")
             return dict(status='ERROR', data="Filename parameter missing.")
@@ -70,14 +379,11 @@ class FileInterface:
             
             if not filename or not filedata: # Memastikan nama file dan data file tidak kosong
                 return dict(status='ERROR', data="Filename or file data cannot be empty.")
+            filename = normalize_filename(filename)
 
-            filepath = self._get_full_path(filename) # Dapatkan jalur lengkap file
-            
-            filebytes = base64.b64decode(filedata)
-            with open(filepath, 'wb') as f: # Buka file menggunakan jalur lengkap
-                f.write(filebytes)
+            sha256 = self._store_upload(filename, lambda f, hasher: b64decode_hashed(filedata, hasher, out=f))
             logging.info(f"Successfully uploaded file '{filename}'.")
-            return dict(status='OK', data=f"{filename} uploaded")
+            return dict(status='OK', data=f"{filename} uploaded", data_sha256=sha256)
         except IndexError: # Menangani jika parameter filename atau filedata tidak ada
             logging.error("UPLOAD command missing filename or filedata parameters.")
             return dict(status='ERROR', data="Filename or filedata parameters missing.")
@@ -85,21 +391,76 @@ class FileInterface:
             logging.error(f"Error uploading file '{filename}': {e}")
             return dict(status='ERROR', data=str(e))
 
+    def _store_upload(self, filename, decode_into):
+        """
+        decode_into(file, hasher) menulis isi file hasil decode ke file sementara
+        sambil meng-update SHA-256 dan mengembalikan jumlah byte-nya. File lalu
+        di-rename ke nama akhir sehingga pembaca tidak pernah melihat file setengah jadi.
+        """
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.upload')
+        try:
+            with tracing.span('decode_write') as sp, os.fdopen(fd, 'wb') as f:
+                size = decode_into(f, hasher)
+                sp.annotate(bytes=size)
+                if size == 0:
+                    raise ValueError("Filename or file data cannot be empty.")
+            sha256 = hasher.hexdigest()
+            with tracing.span('commit'):
+                self._commit_file(filename, tmp_path, sha256)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256
+
+    def begin_upload(self, filename):
+        """
+        Memulai UPLOAD yang payload base64-nya diberikan bertahap lewat
+        StreamingUpload.feed() (lihat connection_manager), tanpa ditampung di memori.
+        """
+        return StreamingUpload(self, filename)
+
+    def replicate(self, params=[]):
+        """
+        Menyimpan salinan file dari server peer (lihat replication.py).
+        PARAMETER3 (opsional) adalah SHA-256 dari server asal; jika tidak cocok,
+        salinan dihapus lagi dan ERROR dikembalikan.
+        """
+        hasil = self.upload(params[:2])
+        expected_sha256 = params[2] if len(params) > 2 else None
+        if hasil['status'] == 'OK' and expected_sha256 and hasil['data_sha256'] != expected_sha256:
+            self.delete(params[:1])
+            logging.error(f"Replica checksum mismatch for '{params[0]}'.")
+            return dict(status='ERROR', data=f"Checksum mismatch for replica '{params[0]}'.")
+        return hasil
+
     def delete(self, params=[]):
         try:
             filename = params[0]
             if not filename: # Memastikan nama file tidak kosong
                 return dict(status='ERROR', data="Filename cannot be empty.")
+            filename = normalize_filename(filename)
+            # PARAMETER2 (opsional) 'replica' menandai DELETE yang diteruskan server peer
+            # (lihat replication.py): tidak diteruskan lagi, dan file yang memang tidak
+            # ada dianggap sudah terhapus agar percobaan ulang tetap berhasil.
+            replica = len(params) > 1 and params[1] == 'replica'
 
             filepath = self._get_full_path(filename) # Dapatkan jalur lengkap file
             
             if not os.path.exists(filepath): # Periksa keberadaan file menggunakan jalur lengkap
                 logging.warning(f"File '{filename}' not found for DELETE at {filepath}.")
+                if replica:
+                    return dict(status='OK', data=f"{filename} deleted", data_replica=True)
                 return dict(status='ERROR', data=f"File '{filename}' not found.")
 
             os.remove(filepath) # Hapus file menggunakan jalur lengkap
+            try:
+                os.remove(self._get_meta_path(filename))
+            except FileNotFoundError:
+                pass
             logging.info(f"Successfully deleted file '{filename}'.")
-            return dict(status='OK', data=f"{filename} deleted")
+            return dict(status='OK', data=f"{filename} deleted", data_replica=replica)
         except IndexError: # Menangani jika parameter filename tidak ada
             logging.error("DELETE command missing filename parameter.")
             return dict(status='ERROR', data="Filename parameter missing.")
@@ -107,6 +468,158 @@ class FileInterface:
             logging.error(f"Error deleting file '{filename}': {e}")
             return dict(status='ERROR', data=str(e))
 
+    def stat(self, params=[]):
+        try:
+            filename = params[0]
+            if not filename: # Memastikan nama file tidak kosong
+                return dict(status='ERROR', data="Filename cannot be empty.")
+            filename = normalize_filename(filename)
+
+            if not os.path.exists(self._get_full_path(filename)):
+                logging.warning(f"File '{filename}' not found for STAT.")
+                return dict(status='ERROR', data=f"File '{filename}' not found.")
+
+            meta = self._get_meta(filename)
+            return dict(status='OK', data_namafile=filename, data_size=meta['size'],
+                        data_mtime_ns=meta['mtime_ns'], data_sha256=meta['sha256'])
+        except IndexError: # Menangani jika parameter filename tidak ada
+            logging.error("STAT command missing filename parameter.")
+            return dict(status='ERROR', data="Filename parameter missing.")
+        except Exception as e:
+            logging.error(f"Error getting stat for file '{filename}': {e}")
+            return dict(status='ERROR', data=str(e))
+
+    # --- Multipart upload ---
+    # Klien memecah file besar menjadi beberapa part yang di-upload paralel lewat
+    # beberapa koneksi. Part disimpan di .multipart/<upload_id>/ dan baru digabung
+    # menjadi file akhir (rename atomik) saat MULTIPART_COMMIT.
+
+    def _get_upload_dir(self, upload_id):
+        if not isinstance(upload_id, str) or len(upload_id) != 32 or not upload_id.isalnum():
+            raise ValueError(f"Invalid upload id '{upload_id}'.")
+        upload_dir = os.path.join(self.multipart_dir, upload_id)
+        if not os.path.isdir(upload_dir):
+            raise ValueError(f"Upload '{upload_id}' not found.")
+        return upload_dir
+
+    def _get_part_path(self, upload_dir, part_number):
+        part_number = int(part_number)
+        if not 1 <= part_number <= MAX_MULTIPART_PARTS:
+            raise ValueError(f"Part number must be between 1 and {MAX_MULTIPART_PARTS}.")
+        return os.path.join(upload_dir, f"part_{part_number:05d}")
+
+    def _cleanup_stale_uploads(self):
+        cutoff = time.time() - MULTIPART_TTL
+        with os.scandir(self.multipart_dir) as it:
+            for entry in it:
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    logging.warning(f"Removing stale multipart upload '{entry.name}'.")
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    def multipart_init(self, params=[]):
+        try:
+            filename = params[0]
+            if not filename: # Memastikan nama file tidak kosong
+                return dict(status='ERROR', data="Filename cannot be empty.")
+            filename = normalize_filename(filename)
+            # PARAMETER2 (opsional) 'replica' menandai upload dari server peer
+            # sehingga tidak direplikasi ulang setelah commit.
+            replica = len(params) > 1 and params[1] == 'replica'
+
+            self._cleanup_stale_uploads()
+            upload_id = uuid.uuid4().hex
+            upload_dir = os.path.join(self.multipart_dir, upload_id)
+            os.makedirs(upload_dir)
+            with open(os.path.join(upload_dir, 'info.json'), 'w') as f:
+                json.dump(dict(name=filename, replica=replica), f)
+            logging.info(f"Multipart upload '{upload_id}' started for '{filename}'.")
+            return dict(status='OK', data_upload_id=upload_id, data_namafile=filename)
+        except IndexError:
+            logging.error("MULTIPART_INIT command missing filename parameter.")
+            return dict(status='ERROR', data="Filename parameter missing.")
+        except Exception as e:
+            logging.error(f"Error starting multipart upload: {e}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_part(self, params=[]):
+        try:
+            upload_id, part_number, filedata = params[0], params[1], params[2]
+            if not filedata:
+                return dict(status='ERROR', data="Part data cannot be empty.")
+            part_path = self._get_part_path(self._get_upload_dir(upload_id), part_number)
+
+            hasher = hashlib.sha256()
+            tmp_path = part_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                size = b64decode_hashed(filedata, hasher, out=f)
+            os.replace(tmp_path, part_path) # part yang di-upload ulang menimpa versi sebelumnya
+            return dict(status='OK', data_part=int(part_number), data_size=size, data_sha256=hasher.hexdigest())
+        except IndexError:
+            logging.error("MULTIPART_PART command missing upload id, part number or data.")
+            return dict(status='ERROR', data="Upload id, part number or part data missing.")
+        except Exception as e:
+            logging.error(f"Error storing multipart part: {e}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_commit(self, params=[]):
+        """
+        PARAMETER2 adalah daftar part yang membentuk file, berurutan, berupa nomor part
+        atau {"part": n, "sha256": "..."}; checksum part diverifikasi saat digabung.
+        """
+        try:
+            upload_id, parts = params[0], params[1]
+            upload_dir = self._get_upload_dir(upload_id)
+            if not parts:
+                return dict(status='ERROR', data="Parts list cannot be empty.")
+            with open(os.path.join(upload_dir, 'info.json')) as f:
+                info = json.load(f)
+
+            file_hasher = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.multipart')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    for part in parts:
+                        part_number = part['part'] if isinstance(part, dict) else part
+                        expected = part.get('sha256') if isinstance(part, dict) else None
+                        part_hasher = hashlib.sha256()
+                        with open(self._get_part_path(upload_dir, part_number), 'rb') as fp:
+                            for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b''):
+                                part_hasher.update(chunk)
+                                file_hasher.update(chunk)
+                                out.write(chunk)
+                        if expected and part_hasher.hexdigest() != expected:
+                            raise ValueError(f"Checksum mismatch for part {part_number}.")
+                sha256 = file_hasher.hexdigest()
+                meta = self._commit_file(info['name'], tmp_path, sha256)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            logging.info(f"Multipart upload '{upload_id}' committed as '{info['name']}'.")
+            return dict(status='OK', data=f"{info['name']} uploaded", data_namafile=info['name'],
+                        data_size=meta['size'], data_sha256=sha256, data_replica=info.get('replica', False))
+        except FileNotFoundError as e:
+            logging.error(f"Missing part while committing multipart upload: {e}")
+            return dict(status='ERROR', data=f"Missing part: {os.path.basename(e.filename or '')}")
+        except (IndexError, KeyError, TypeError):
+            logging.error("MULTIPART_COMMIT command has invalid parameters.")
+            return dict(status='ERROR', data="Upload id and parts list required.")
+        except Exception as e:
+            logging.error(f"Error committing multipart upload: {e}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_abort(self, params=[]):
+        try:
+            upload_dir = self._get_upload_dir(params[0])
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            return dict(status='OK', data=f"Upload {params[0]} aborted")
+        except IndexError:
+            return dict(status='ERROR', data="Upload id parameter missing.")
+        except Exception as e:
+            logging.error(f"Error aborting multipart upload: {e}")
+            return dict(status='ERROR', data=str(e))
+
 # Bagian ini hanya berjalan jika script ini dieksekusi langsung
 # (tidak saat di-import oleh file lain seperti file_protocol.py)
 if __name__=='__main__':
@@ -3,6 +3,8 @@ import logging
 import shlex
 
 from file_interface import FileInterface
+from stream_codec import iter_json_response
+import tracing
 
 """
 * class FileProtocol bertugas untuk memproses 
@@ -16,25 +18,130 @@ pada akhirnya akan diproses dalam bentuk string
 string
 """
 
+# Panjang maksimal string request/parameter yang ditulis ke log
+LOG_PREVIEW = 100
+# Perintah protokol yang diteruskan ke method FileInterface bernama sama (lihat
+# PROTOKOL.txt). Method lain (helper, begin_upload) tidak boleh dipanggil klien.
+FILE_COMMANDS = frozenset(['list', 'get', 'stat', 'upload', 'replicate', 'delete',
+                           'multipart_init', 'multipart_part', 'multipart_commit', 'multipart_abort'])
+
+
+def _log_preview(value):
+    if isinstance(value, str) and len(value) > LOG_PREVIEW:
+        return f"{value[:LOG_PREVIEW]}... ({len(value)} karakter)"
+    return value
 
 
 class FileProtocol:
-    def __init__(self):
-        self.file = FileInterface()
+    def __init__(self, storage_dir=None, replicator=None, durability=None):
+        self.file = FileInterface(storage_dir=storage_dir, durability=durability)
+        # replicator (opsional, lihat replication.py) menyalin setiap UPLOAD ke server peer
+        self.replicator = replicator
     def proses_string(self, string_datamasuk=''):
-        logging.warning(f"string diproses: {string_datamasuk}")
+        """
+        Respons sebagai satu string JSON utuh (tanpa pemisah).
+        """
+        return b''.join(iter_json_response(self._proses(string_datamasuk))).decode('utf-8')
+
+    def proses_response(self, string_datamasuk=''):
+        """
+        Respons sebagai iterator potongan bytes, sudah diakhiri pemisah "\r\n\r\n".
+        Isi file GET dibaca dari disk dan di-encode per chunk saat dikirim, jadi
+        memori per GET tetap sebesar satu chunk berapa pun ukuran filenya.
+        """
+        return iter_json_response(self._proses(string_datamasuk), terminator=b"\r\n\r\n")
+
+    def begin_upload(self, filename):
+        """
+        UPLOAD yang payload base64-nya dialirkan dari socket: connection_manager
+        memanggil feed() pada objek yang dikembalikan setiap kali data tiba, lalu
+        finish_upload() setelah frame selesai.
+        """
+        logging.warning(f"memproses request: upload (streaming) '{filename}'")
+        return self.file.begin_upload(filename)
+
+    def finish_upload(self, upload):
+        """
+        Menyimpan UPLOAD streaming; respons sama seperti proses_response.
+        """
+        tracing.annotate(command='upload', streaming=True, bytes=upload.size)
+        with tracing.span('file.upload_stream'):
+            cl = upload.finish()
+        if self.replicator is not None and cl.get('status') == 'OK':
+            # Payload base64 tidak disimpan, jadi salinan ke peer dikirim dari file di disk
+            cl = self.replicate_stored(upload.filename, cl)
+        return iter_json_response(cl, terminator=b"\r\n\r\n")
+
+    def _proses(self, string_datamasuk):
+        # Payload base64 (UPLOAD/REPLICATE/MULTIPART_PART) bisa ratusan MB: jangan ikut di-log
+        logging.warning(f"string diproses: {string_datamasuk[:LOG_PREVIEW]}")
         try:
-            c = json.loads(string_datamasuk)
+            with tracing.span('json_parse', bytes=len(string_datamasuk)):
+                c = json.loads(string_datamasuk)
             c_request = c.get('command', '').lower()
             logging.warning(f"memproses request: {c_request}")
+            tracing.annotate(command=c_request)
             params = c.get('params', [])
-            logging.warning(f"params: {params}")
-            cl = getattr(self.file, c_request)(params)
-            return json.dumps(cl)
+            logging.warning(f"params: {[_log_preview(p) for p in params]}")
+            if c_request == 'trace_dump':
+                return self.trace_dump(params)
+            if c_request not in FILE_COMMANDS:
+                logging.warning(f"Perintah tidak dikenal: {_log_preview(c_request)}")
+                return dict(status='ERROR', data=f"Unknown command '{_log_preview(c_request)}'.")
+            with tracing.span(f"file.{c_request}"):
+                cl = getattr(self.file, c_request)(params)
+            if self.replicator is not None and cl.get('status') == 'OK':
+                if c_request == 'upload':
+                    cl = self.replicate_upload(params, cl)
+                elif c_request == 'multipart_commit' and not cl.get('data_replica'):
+                    cl = self.replicate_stored(cl['data_namafile'], cl)
+                elif c_request == 'delete' and not cl.get('data_replica'):
+                    cl = self.replicate_delete(params[0], cl)
+            return cl
         except Exception as e:
             logging.warning(f"Exception saat memproses perintah: {e}")
-            return json.dumps(dict(status='ERROR', data=str(e)))
+            return dict(status='ERROR', data=str(e))
+
+    def trace_dump(self, params):
+        """
+        TRACE_DUMP [clear]: isi ring buffer tracing dalam format Chrome trace JSON.
+        """
+        trace = tracing.dump(clear=bool(params) and params[0] == 'clear')
+        if trace is None:
+            return dict(status='ERROR', data="Tracing is not enabled (start the server with --trace-sample).")
+        return dict(status='OK', data_trace=trace)
+
+    def replicate_upload(self, params, cl):
+        """
+        Menyalin file yang baru di-upload ke peer. UPLOAD hanya dijawab OK jika
+        jumlah ack sinkron yang diminta tercapai.
+        """
+        with tracing.span('replicate'):
+            acks, ok = self.replicator.replicate(params[0], params[1], cl['data_sha256'])
+        return self._replication_result(params[0], cl, acks, ok)
+
+    def replicate_stored(self, filename, cl):
+        """
+        Menyalin file yang sudah tersimpan di disk (hasil MULTIPART_COMMIT atau
+        UPLOAD streaming) ke peer.
+        """
+        with tracing.span('replicate'):
+            acks, ok = self.replicator.replicate_file(filename, self.file._get_full_path(filename), cl['data_sha256'])
+        return self._replication_result(filename, cl, acks, ok)
+
+    def replicate_delete(self, filename, cl):
+        """
+        Meneruskan DELETE ke peer agar salinan di sana ikut terhapus.
+        """
+        with tracing.span('replicate'):
+            acks, ok = self.replicator.replicate_delete(filename)
+        return self._replication_result(filename, cl, acks, ok, action='deleted')
 
+    def _replication_result(self, filename, cl, acks, ok, action='stored'):
+        if not ok:
+            return dict(status='ERROR', data=f"{filename} {action} locally but only {acks} of "
+                                             f"{self.replicator.sync_acks} replica acknowledgements received.")
+        return dict(cl, data_replicas_acked=acks)
 
 
 if __name__=='__main__':
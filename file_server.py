@@ -4,9 +4,12 @@ import threading
 import logging
 import time
 import sys
+import argparse
 
 
 from file_protocol import  FileProtocol
+from connection_manager import serve_connection
+from durability import add_durability_args, durability_from_args
 fp = FileProtocol()
 
 
@@ -16,20 +19,22 @@ class ProcessTheClient(threading.Thread):
         self.address = address
         threading.Thread.__init__(self)
 
+    def process_message(self, message):
+        for piece in fp.proses_response(message):
+            self.connection.sendall(piece)
+        return True
+
+    def begin_upload(self, filename):
+        return fp.begin_upload(filename)
+
+    def finish_upload(self, upload):
+        for piece in fp.finish_upload(upload):
+            self.connection.sendall(piece)
+        return True
+
     def run(self):
-        buffer = ""
         try:
-            while True:
-                data = self.connection.recv(4096)
-                if not data:
-                    break
-                buffer += data.decode()
-
-                while "\r\n\r\n" in buffer:
-                    message, buffer = buffer.split("\r\n\r\n", 1)
-                    hasil = fp.proses_string(message)
-                    hasil += "\r\n\r\n"
-                    self.connection.sendall(hasil.encode())
+            serve_connection(self.connection, self.address, self)
         except Exception as e:
             logging.warning(f"Error: {e}")
         finally:
@@ -56,8 +61,22 @@ class Server(threading.Thread):
             self.the_clients.append(clt)
 
 
-def main():
-    svr = Server(ipaddress='0.0.0.0',port=6666)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="File server (satu thread per koneksi)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=6666)
+    parser.add_argument('--storage-dir', default=None,
+                        help="direktori penyimpanan file (default: files/ di samping skrip)")
+    add_durability_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global fp
+    args = parse_args(argv)
+    if args.storage_dir or args.durability != 'none':
+        fp = FileProtocol(storage_dir=args.storage_dir, durability=durability_from_args(args))
+    svr = Server(ipaddress=args.host,port=args.port)
     svr.start()
 
 
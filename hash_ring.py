@@ -0,0 +1,80 @@
+import bisect
+import hashlib
+
+"""
+* HashRing memetakan nama file ke node file server dengan consistent hashing.
+  Setiap node ditempatkan di ring sebanyak 'vnodes' kali (virtual node) agar
+  pembagian kunci merata, dan saat node ditambah/dihapus hanya kunci di
+  sekitar posisi node tersebut yang berpindah pemilik.
+
+* Node direpresentasikan sebagai string "host:port".
+"""
+
+DEFAULT_VNODES = 100
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+def parse_node(node):
+    """
+    "host:port" -> (host, port)
+    """
+    host, _, port = node.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Alamat node tidak valid: '{node}' (format host:port)")
+    return host, int(port)
+
+
+def parse_node_list(value):
+    """
+    Membaca daftar node dari string "h1:p1,h2:p2" atau dari file (satu node per
+    baris, baris kosong dan komentar '#' diabaikan) jika value diawali '@'.
+    """
+    if value.startswith('@'):
+        with open(value[1:]) as f:
+            items = [line.split('#', 1)[0].strip() for line in f]
+    else:
+        items = [v.strip() for v in value.split(',')]
+    nodes = [v for v in items if v]
+    for node in nodes:
+        parse_node(node)
+    return nodes
+
+
+class HashRing:
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self.nodes = []
+        self._keys = [] # posisi virtual node di ring (terurut)
+        self._owners = [] # node pemilik untuk setiap posisi di _keys
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            key = _hash(f"{node}#{i}")
+            idx = bisect.bisect(self._keys, key)
+            self._keys.insert(idx, key)
+            self._owners.insert(idx, node)
+
+    def remove_node(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        pairs = [(k, n) for k, n in zip(self._keys, self._owners) if n != node]
+        self._keys = [k for k, _ in pairs]
+        self._owners = [n for _, n in pairs]
+
+    def get_node(self, key):
+        """
+        Node pemilik kunci: virtual node pertama searah jarum jam dari hash kunci.
+        """
+        if not self._keys:
+            raise ValueError("Hash ring kosong: tidak ada node.")
+        idx = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[idx]
@@ -0,0 +1,77 @@
+import os
+import sys
+import argparse
+import logging
+
+from file_interface import FileInterface, normalize_filename
+
+"""
+* migrate_storage.py memindahkan direktori penyimpanan lama yang masih flat
+  (semua file langsung di dalam files/) ke layout shard berbasis hash yang
+  dipakai FileInterface, misalnya files/foto.jpg -> files/3f/a2/foto.jpg.
+
+* Sidecar metadata lama (.meta/<nama>.json) ikut dipindahkan ke
+  .meta/<shard>/<nama>.json. Nama logis yang terlihat lewat LIST/GET tidak berubah.
+
+* Pemindahan memakai os.replace di filesystem yang sama (tanpa menyalin isi
+  file), dan aman dijalankan ulang: file yang sudah berada di shard tidak disentuh.
+  Server sebaiknya dimatikan selama migrasi berjalan.
+"""
+
+
+def migrate(storage_dir=None, dry_run=False):
+    """
+    Memindahkan semua file di level teratas storage_dir ke direktori shard-nya.
+    Mengembalikan (jumlah_dipindah, jumlah_dilewati).
+    """
+    fi = FileInterface(storage_dir=storage_dir)
+    moved = 0
+    skipped = 0
+    with os.scandir(fi.storage_dir) as it:
+        entries = [e for e in it if e.is_file(follow_symlinks=False)]
+
+    for entry in entries:
+        try:
+            filename = normalize_filename(entry.name)
+        except ValueError as e:
+            logging.warning(f"Melewati '{entry.name}': {e}")
+            skipped += 1
+            continue
+
+        target = fi._get_full_path(filename)
+        if os.path.exists(target):
+            logging.warning(f"Melewati '{entry.name}': sudah ada di {target}")
+            skipped += 1
+            continue
+
+        old_meta = os.path.join(fi.meta_dir, entry.name + '.json')
+        new_meta = fi._get_meta_path(filename)
+        logging.info(f"{entry.path} -> {target}")
+        if not dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(entry.path, target)
+            if os.path.isfile(old_meta):
+                os.makedirs(os.path.dirname(new_meta), exist_ok=True)
+                os.replace(old_meta, new_meta)
+        moved += 1
+    return moved, skipped
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migrasi direktori penyimpanan flat ke layout shard")
+    parser.add_argument('--storage-dir', default=None,
+                        help="direktori penyimpanan (default: files/ di samping skrip)")
+    parser.add_argument('--dry-run', action='store_true', help="hanya tampilkan file yang akan dipindahkan")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    moved, skipped = migrate(args.storage_dir, dry_run=args.dry_run)
+    print(f"Selesai: {moved} file {'akan dipindahkan' if args.dry_run else 'dipindahkan'}, {skipped} dilewati.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import base64
+import logging
+import threading
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from file_client_cli import connect_to_server, send_command_persistent
+from hash_ring import parse_node
+
+"""
+* Replicator menyalin file hasil UPLOAD ke server peer dengan perintah
+  REPLICATE (peer menyimpan file tanpa mereplikasi ulang, sehingga tidak
+  ada loop).
+
+* File hasil multipart upload disalin ke peer dengan multipart juga
+  (MULTIPART_INIT dengan penanda 'replica'), sehingga file besar tidak
+  pernah di-encode utuh di memori.
+
+* DELETE diteruskan ke peer dengan penanda 'replica' (DELETE nama replica),
+  sehingga peer menghapus salinannya tanpa meneruskannya lagi.
+
+* Salinan dikirim ke semua peer secara paralel. UPLOAD baru dijawab setelah
+  'sync_acks' peer mengonfirmasi; salinan ke peer lainnya tetap berjalan
+  di background (dengan beberapa kali percobaan ulang).
+"""
+
+DEFAULT_RETRIES = 3
+RETRY_DELAY = 0.5
+REPLICA_PART_SIZE = 8 * 1024 * 1024
+
+
+class PeerConnectionPool:
+    """
+    Pool koneksi persistent ke satu peer agar setiap replikasi tidak membuka
+    koneksi TCP baru.
+    """
+    def __init__(self, node):
+        self.node = node
+        self.address = parse_node(node)
+        self.idle = queue.SimpleQueue()
+
+    def command(self, command_dict):
+        try:
+            sock = self.idle.get_nowait()
+        except queue.Empty:
+            sock = connect_to_server(self.address)
+            if sock is None:
+                return False
+        hasil = send_command_persistent(sock, command_dict)
+        if hasil is False:
+            sock.close() # koneksi dalam keadaan tidak pasti, jangan dipakai ulang
+        else:
+            self.idle.put(sock)
+        return hasil
+
+
+class Replicator:
+    def __init__(self, peers, sync_acks=1, retries=DEFAULT_RETRIES):
+        self.peers = [PeerConnectionPool(node) for node in peers]
+        self.sync_acks = min(sync_acks, len(self.peers))
+        self.retries = retries
+        # Beberapa worker per peer agar upload yang bersamaan bisa direplikasi paralel
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.peers) * 4),
+                                           thread_name_prefix='replicator')
+        self.stats_lock = threading.Lock()
+        self.async_failures = 0
+
+    def _send_copy(self, peer, filename, b64_data, sha256):
+        hasil = peer.command({"command": "REPLICATE", "params": [filename, b64_data, sha256]})
+        return self._check(peer, filename, hasil)
+
+    def _send_multipart(self, peer, filename, filepath, sha256):
+        """
+        Menyalin file besar (hasil multipart upload) ke peer per part, sehingga
+        file tidak perlu di-encode utuh di memori.
+        """
+        hasil = peer.command({"command": "MULTIPART_INIT", "params": [filename, 'replica']})
+        if not self._check(peer, filename, hasil):
+            return False
+        upload_id = hasil['data_upload_id']
+        parts = []
+        try:
+            with open(filepath, 'rb') as fp:
+                for part_number, chunk in enumerate(iter(lambda: fp.read(REPLICA_PART_SIZE), b''), start=1):
+                    hasil = peer.command({"command": "MULTIPART_PART",
+                                          "params": [upload_id, part_number, base64.b64encode(chunk).decode('ascii')]})
+                    if not self._check(peer, filename, hasil):
+                        peer.command({"command": "MULTIPART_ABORT", "params": [upload_id]})
+                        return False
+                    parts.append(part_number)
+        except OSError as e:
+            # File lokal dihapus/diganti saat sedang dibaca
+            logging.warning(f"Replikasi '{filename}' ke {peer.node} gagal membaca file: {e}")
+            peer.command({"command": "MULTIPART_ABORT", "params": [upload_id]})
+            return False
+        hasil = peer.command({"command": "MULTIPART_COMMIT", "params": [upload_id, parts]})
+        return self._check(peer, filename, hasil) and hasil.get('data_sha256') == sha256
+
+    def _send_delete(self, peer, filename):
+        hasil = peer.command({"command": "DELETE", "params": [filename, 'replica']})
+        return self._check(peer, filename, hasil)
+
+    def _check(self, peer, filename, hasil):
+        if hasil and hasil.get('status') == 'OK':
+            return True
+        logging.warning(f"Replikasi '{filename}' ke {peer.node} gagal: "
+                        f"{hasil.get('data') if hasil else 'tidak ada respons'}")
+        return False
+
+    def _attempt(self, send, peer, filename):
+        """
+        Satu percobaan send(peer). Exception apa pun dianggap percobaan gagal, agar
+        UPLOAD tetap dijawab dan percobaan ulang di background tetap dijadwalkan.
+        """
+        try:
+            return send(peer)
+        except Exception as e:
+            logging.warning(f"Replikasi '{filename}' ke {peer.node} gagal: {e}")
+            return False
+
+    def _send_background(self, send, peer, filename):
+        for attempt in range(self.retries):
+            time.sleep(RETRY_DELAY * (attempt + 1))
+            if self._attempt(send, peer, filename):
+                return
+        with self.stats_lock:
+            self.async_failures += 1
+        logging.error(f"Replikasi async '{filename}' ke {peer.node} gagal setelah {self.retries} percobaan.")
+
+    def _replicate(self, filename, send):
+        """
+        Menjalankan send(peer) ke semua peer secara paralel. Mengembalikan
+        (jumlah_ack_sinkron, berhasil), di mana berhasil berarti minimal
+        sync_acks peer sudah mengonfirmasi. Peer yang gagal di percobaan pertama
+        dicoba ulang di background.
+        """
+        if not self.peers:
+            return 0, True
+        pending = {self.executor.submit(self._attempt, send, peer, filename): peer for peer in self.peers}
+        acks = 0
+        while pending and acks < self.sync_acks:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                peer = pending.pop(future)
+                if future.result():
+                    acks += 1
+                else:
+                    self.executor.submit(self._send_background, send, peer, filename)
+        for future, peer in pending.items():
+            # Peer yang belum selesai tetap berjalan; jika gagal, retry di background
+            future.add_done_callback(
+                lambda f, peer=peer: f.result() or self.executor.submit(
+                    self._send_background, send, peer, filename))
+        return acks, acks >= self.sync_acks
+
+    def replicate(self, filename, b64_data, sha256):
+        """
+        Mereplikasi hasil UPLOAD biasa; payload base64 diteruskan apa adanya.
+        """
+        return self._replicate(filename, lambda peer: self._send_copy(peer, filename, b64_data, sha256))
+
+    def replicate_file(self, filename, filepath, sha256):
+        """
+        Mereplikasi file yang sudah ada di disk (misalnya hasil MULTIPART_COMMIT).
+        """
+        return self._replicate(filename, lambda peer: self._send_multipart(peer, filename, filepath, sha256))
+
+    def replicate_delete(self, filename):
+        """
+        Menghapus salinan file di semua peer.
+        """
+        return self._replicate(filename, lambda peer: self._send_delete(peer, filename))
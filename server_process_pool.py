@@ -4,10 +4,18 @@ import threading
 import logging
 import time
 import sys
+import argparse
 from concurrent.futures import ThreadPoolExecutor # Or ProcessPoolExecutor
 
+from connection_manager import ConnectionManager, DEFAULT_IDLE_TIMEOUT, LISTEN_BACKLOG, serve_connection
+from replication import Replicator
+from hash_ring import parse_node_list
+from bandwidth import add_bandwidth_args, scheduler_from_args
+from durability import add_durability_args, durability_from_args
+import tracing
+
 # Asumsi file_protocol.py ada dan berisi kelas FileProtocol
-# yang memiliki metode proses_string(message)
+# yang memiliki metode proses_response(message)
 from file_protocol import FileProtocol
 
 # Konfigurasi logging
@@ -18,75 +26,128 @@ class ClientHandler:
     """
     Kelas ini menangani komunikasi dengan satu klien.
     """
-    def __init__(self, connection, address, server_stats): # Tambahkan server_stats sebagai argumen
+    def __init__(self, connection, address, server_stats, storage_dir=None, replicator=None,
+                 scheduler=None, durability=None): # Tambahkan server_stats sebagai argumen
         self.connection = connection
+        self.scheduler = scheduler # FairScheduler bersama; None berarti sendall langsung
+        self.flow = None # flow FairScheduler koneksi ini, dibuka saat respons pertama
         self.address = address
-        self.fp = FileProtocol() # Setiap handler memiliki instance FileProtocol-nya sendiri
+        self.fp = FileProtocol(storage_dir=storage_dir, replicator=replicator,
+                               durability=durability) # Setiap handler memiliki instance FileProtocol-nya sendiri
         self.server_stats = server_stats # Referensi ke objek statistik server
         logging.info(f"Client handler created for {address}")
 
+    def process_message(self, message):
+        """
+        Memproses satu pesan lengkap (tanpa pemisah) dan mengirim hasilnya.
+        Mengembalikan False jika koneksi harus ditutup setelah pesan ini.
+        """
+        logging.info(f"Received message from {self.address}: {message[:50]}...")
+
+        # === START: Handle GET_SERVER_STATS command ===
+        if message.strip() == "GET_SERVER_STATS":
+            with self.server_stats['lock']:
+                stats_response = (
+                    f"SERVER_STATS_SUCCESS:{self.server_stats['successful_operations']}"
+                    f"\r\nSERVER_STATS_FAILED:{self.server_stats['failed_operations']}"
+                )
+            stats_response += "\r\n\r\n" # Always end with separator
+            self.connection.sendall(stats_response.encode('utf-8'))
+            logging.info(f"Sent server stats to {self.address}")
+            # After sending stats, gracefully close this connection
+            return False
+        # === END: Handle GET_SERVER_STATS command ===
+
+        # Original file protocol processing
+        # Respons (sudah termasuk pemisah) dikirim per potongan, lihat FileProtocol.proses_response
+        with tracing.request('request', client=f"{self.address[0]}:{self.address[1]}"):
+            pieces = self.fp.proses_response(message)
+            with tracing.span('send'):
+                for piece in pieces:
+                    self.send_response(piece)
+        logging.info(f"Sent response to {self.address}")
+
+        # Update successful operations count only for actual file operations
+        with self.server_stats['lock']:
+            self.server_stats['successful_operations'] += 1
+        return True
+
+    def begin_upload(self, filename):
+        """
+        Awal frame UPLOAD yang payload-nya diteruskan bertahap oleh ConnectionManager
+        (lihat FileProtocol.begin_upload); isi file langsung di-decode ke disk.
+        """
+        logging.info(f"Received streamed UPLOAD '{filename}' from {self.address}")
+        return self.fp.begin_upload(filename)
+
+    def finish_upload(self, upload):
+        # Request span mencakup seluruh upload sejak awal frame, termasuk fase recv
+        # dan decode_write setiap potongan payload (lihat StreamingUpload)
+        with tracing.request('request', start=upload.trace_start, phases=upload.trace_phases,
+                             client=f"{self.address[0]}:{self.address[1]}"):
+            for piece in self.fp.finish_upload(upload):
+                self.send_response(piece)
+        logging.info(f"Sent response to {self.address}")
+
+        with self.server_stats['lock']:
+            self.server_stats['successful_operations'] += 1
+        return True
+
+    def send_response(self, data):
+        with tracing.span('sendall', bytes=len(data)):
+            if self.scheduler is None:
+                self.connection.sendall(data)
+            else:
+                if self.flow is None:
+                    # Satu flow per koneksi: batas per koneksi dan giliran adil berlaku lintas respons
+                    self.flow = self.scheduler.open_flow(client_key=self.address[0])
+                self.scheduler.send(self.connection, data, self.flow)
+
+    def handle_error(self, e):
+        if isinstance(e, ConnectionResetError):
+            logging.warning(f"Client {self.address} forcibly disconnected.")
+        else:
+            logging.error(f"Error processing client {self.address}: {e}", exc_info=True)
+        with self.server_stats['lock']:
+            self.server_stats['failed_operations'] += 1
+
+    def close(self):
+        logging.warning(f"Closing connection for {self.address}")
+        if self.flow is not None:
+            self.scheduler.close_flow(self.flow)
+            self.flow = None
+        self.connection.close()
+
     def run(self):
         """
-        Metode ini berisi logika untuk memproses data dari klien.
+        Mode blocking lama: satu worker memegang koneksi selama koneksi terbuka.
+        Dipakai jika server dijalankan dengan use_selector=False.
         """
-        buffer = ""
         try:
             logging.warning(f"Starting to process client {self.address}")
-            while True:
-                data = self.connection.recv(4096)
-                if not data:
-                    logging.warning(f"Client {self.address} disconnected gracefully.")
-                    break
-
-                buffer += data.decode('utf-8')
-
-                while "\r\n\r\n" in buffer:
-                    message, buffer = buffer.split("\r\n\r\n", 1)
-                    logging.info(f"Received message from {self.address}: {message[:50]}...")
-                    
-                    # === START: Handle GET_SERVER_STATS command ===
-                    if message.strip() == "GET_SERVER_STATS":
-                        with self.server_stats['lock']:
-                            stats_response = (
-                                f"SERVER_STATS_SUCCESS:{self.server_stats['successful_operations']}"
-                                f"\r\nSERVER_STATS_FAILED:{self.server_stats['failed_operations']}"
-                            )
-                        stats_response += "\r\n\r\n" # Always end with separator
-                        self.connection.sendall(stats_response.encode('utf-8'))
-                        logging.info(f"Sent server stats to {self.address}")
-                        # After sending stats, gracefully close this connection
-                        return # Exit run method for this special request
-                    # === END: Handle GET_SERVER_STATS command ===
-
-                    # Original file protocol processing
-                    hasil = self.fp.proses_string(message)
-                    hasil += "\r\n\r\n"
-
-                    self.connection.sendall(hasil.encode('utf-8'))
-                    logging.info(f"Sent response to {self.address}: {hasil[:50]}...")
-                    
-                    # Update successful operations count only for actual file operations
-                    with self.server_stats['lock']:
-                        self.server_stats['successful_operations'] += 1
-
-        except ConnectionResetError:
-            logging.warning(f"Client {self.address} forcibly disconnected.")
-            with self.server_stats['lock']:
-                self.server_stats['failed_operations'] += 1
+            serve_connection(self.connection, self.address, self)
         except Exception as e:
-            logging.error(f"Error processing client {self.address}: {e}", exc_info=True)
-            with self.server_stats['lock']:
-                self.server_stats['failed_operations'] += 1
+            self.handle_error(e)
         finally:
-            logging.warning(f"Closing connection for {self.address}")
-            self.connection.close()
+            self.close()
 
 class Server(threading.Thread):
     """
     Kelas Server menerima koneksi klien dan menyerahkannya ke thread pool.
+    Secara default koneksi dikelola oleh ConnectionManager: koneksi idle diparkir
+    di selector dan worker hanya dipakai saat ada request lengkap.
     """
-    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10):
+    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10, storage_dir=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, use_selector=True, replicator=None, scheduler=None,
+                 durability=None):
         self.ipinfo = (ipaddress, port)
+        self.storage_dir = storage_dir
+        self.replicator = replicator # dipakai bersama oleh semua handler
+        self.scheduler = scheduler # pembagian bandwidth keluar antar koneksi
+        self.durability = durability # dipakai bersama agar commit antar handler bisa digabung
+        self.idle_timeout = idle_timeout
+        self.use_selector = use_selector
+        self.manager = None
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.executor = ThreadPoolExecutor(max_workers=max_workers) # Using ThreadPoolExecutor
@@ -99,6 +160,10 @@ class Server(threading.Thread):
             'lock': threading.Lock() # Lock untuk mengamankan akses ke penghitung
         }
 
+    def create_handler(self, connection, client_address):
+        return ClientHandler(connection, client_address, self.server_stats, self.storage_dir, self.replicator,
+                             self.scheduler, self.durability)
+
     def run(self):
         """
         Metode run server yang menerima koneksi.
@@ -106,24 +171,29 @@ class Server(threading.Thread):
         logging.warning(f"Server berjalan di IP address {self.ipinfo[0]} port {self.ipinfo[1]}")
         try:
             self.my_socket.bind(self.ipinfo)
-            self.my_socket.listen(5)
+            self.my_socket.listen(LISTEN_BACKLOG)
         except Exception as e:
             logging.critical(f"Failed to start server: {e}")
             sys.exit(1)
 
-        while True:
-            try:
-                connection, client_address = self.my_socket.accept()
-                logging.warning(f"Koneksi dari {client_address}")
-                
-                handler = ClientHandler(connection, client_address, self.server_stats)
-                self.executor.submit(handler.run)
-            except KeyboardInterrupt:
-                logging.warning("Server dimatikan oleh pengguna.")
-                break
-            except Exception as e:
-                logging.error(f"Error accepting new connection: {e}", exc_info=True)
-        
+        if self.use_selector:
+            self.manager = ConnectionManager(self.my_socket, self.executor, self.create_handler,
+                                             idle_timeout=self.idle_timeout)
+            self.manager.serve_forever()
+        else:
+            while True:
+                try:
+                    connection, client_address = self.my_socket.accept()
+                    logging.warning(f"Koneksi dari {client_address}")
+
+                    handler = self.create_handler(connection, client_address)
+                    self.executor.submit(handler.run)
+                except KeyboardInterrupt:
+                    logging.warning("Server dimatikan oleh pengguna.")
+                    break
+                except Exception as e:
+                    logging.error(f"Error accepting new connection: {e}", exc_info=True)
+
         self.executor.shutdown(wait=True)
         self.my_socket.close()
         
@@ -136,11 +206,43 @@ class Server(threading.Thread):
         logging.warning("Server berhenti.")
 
 
-def main():
+def parse_args(argv=None):
+    """
+    Argumen command line, dipakai juga oleh benchmark_matrix.py untuk
+    menjalankan server di port dan jumlah worker tertentu.
+    """
+    parser = argparse.ArgumentParser(description="File server dengan pool worker dan statistik operasi")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=6666)
+    parser.add_argument('--workers', type=int, default=50, help="jumlah worker pool")
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="detik sebelum koneksi keep-alive yang idle ditutup")
+    parser.add_argument('--blocking', action='store_true',
+                        help="mode lama: satu worker per koneksi selama koneksi terbuka")
+    parser.add_argument('--storage-dir', default=None,
+                        help="direktori penyimpanan file (default: files/ di samping skrip)")
+    parser.add_argument('--peers', default='',
+                        help="server peer untuk replikasi UPLOAD: h1:p1,h2:p2 atau @file")
+    parser.add_argument('--sync-acks', type=int, default=1,
+                        help="jumlah peer yang harus mengonfirmasi sebelum UPLOAD dijawab")
+    add_durability_args(parser)
+    add_bandwidth_args(parser)
+    tracing.add_trace_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     Fungsi utama untuk menjalankan server.
     """
-    svr = Server(ipaddress='0.0.0.0', port=6666, max_workers=50)
+    args = parse_args(argv)
+    tracing.configure_from_args(args)
+    peers = parse_node_list(args.peers) if args.peers else []
+    replicator = Replicator(peers, sync_acks=args.sync_acks) if peers else None
+    svr = Server(ipaddress=args.host, port=args.port, max_workers=args.workers,
+                 storage_dir=args.storage_dir, idle_timeout=args.idle_timeout,
+                 use_selector=not args.blocking, replicator=replicator,
+                 scheduler=scheduler_from_args(args), durability=durability_from_args(args))
     svr.start()
     
     try:
@@ -4,12 +4,21 @@ import threading
 import logging
 import time
 import sys
+import argparse
 from concurrent.futures import ThreadPoolExecutor # Import ThreadPoolExecutor
 
+from connection_manager import ConnectionManager, DEFAULT_IDLE_TIMEOUT, LISTEN_BACKLOG, serve_connection
+from replication import Replicator
+from hash_ring import parse_node_list
+from bandwidth import add_bandwidth_args, scheduler_from_args
+from durability import add_durability_args, durability_from_args
+import tracing
+
 # Asumsi file_protocol.py ada dan berisi kelas FileProtocol
-# yang memiliki metode proses_string(message)
+# yang memiliki metode proses_response(message)
 from file_protocol import FileProtocol
 fp = FileProtocol()
+scheduler = None # FairScheduler untuk respons keluar; None berarti sendall langsung
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.WARNING,
@@ -23,50 +32,92 @@ class ClientHandler:
     def __init__(self, connection, address):
         self.connection = connection
         self.address = address
+        self.flow = None # flow FairScheduler koneksi ini, dibuka saat respons pertama
         logging.info(f"Client handler created for {address}")
 
+    def process_message(self, message):
+        """
+        Memproses satu pesan lengkap (tanpa pemisah) dan mengirim hasilnya.
+        Mengembalikan True karena koneksi tetap dibuka (keep-alive).
+        """
+        logging.info(f"Received message from {self.address}: {message[:50]}...") # Log 50 karakter pertama
+
+        # Memproses pesan menggunakan FileProtocol; respons (sudah termasuk pemisah)
+        # dikirim per potongan tanpa pernah dibangun utuh di memori
+        with tracing.request('request', client=f"{self.address[0]}:{self.address[1]}"):
+            pieces = fp.proses_response(message)
+            with tracing.span('send'):
+                for piece in pieces:
+                    self.send_response(piece)
+        logging.info(f"Sent response to {self.address}")
+        return True
+
+    def begin_upload(self, filename):
+        """
+        Awal frame UPLOAD yang payload-nya diteruskan bertahap oleh ConnectionManager
+        (lihat FileProtocol.begin_upload); isi file langsung di-decode ke disk.
+        """
+        logging.info(f"Received streamed UPLOAD '{filename}' from {self.address}")
+        return fp.begin_upload(filename)
+
+    def finish_upload(self, upload):
+        # Request span mencakup seluruh upload sejak awal frame, termasuk fase recv
+        # dan decode_write setiap potongan payload (lihat StreamingUpload)
+        with tracing.request('request', start=upload.trace_start, phases=upload.trace_phases,
+                             client=f"{self.address[0]}:{self.address[1]}"):
+            for piece in fp.finish_upload(upload):
+                self.send_response(piece)
+        logging.info(f"Sent response to {self.address}")
+        return True
+
+    def send_response(self, data):
+        with tracing.span('sendall', bytes=len(data)):
+            if scheduler is None:
+                self.connection.sendall(data)
+            else:
+                if self.flow is None:
+                    # Satu flow per koneksi: batas per koneksi dan giliran adil berlaku lintas respons
+                    self.flow = scheduler.open_flow(client_key=self.address[0])
+                scheduler.send(self.connection, data, self.flow)
+
+    def handle_error(self, e):
+        if isinstance(e, ConnectionResetError):
+            logging.warning(f"Client {self.address} forcibly disconnected.")
+        else:
+            logging.error(f"Error processing client {self.address}: {e}", exc_info=True)
+
+    def close(self):
+        logging.warning(f"Closing connection for {self.address}")
+        if self.flow is not None:
+            scheduler.close_flow(self.flow)
+            self.flow = None
+        self.connection.close()
+
     def run(self):
         """
-        Metode ini berisi logika untuk memproses data dari klien.
+        Mode blocking lama: satu worker memegang koneksi selama koneksi terbuka.
+        Dipakai jika server dijalankan dengan use_selector=False.
         """
-        buffer = ""
         try:
             logging.warning(f"Starting to process client {self.address}")
-            while True:
-                # Menerima data dari klien
-                data = self.connection.recv(4096)
-                if not data:
-                    logging.warning(f"Client {self.address} disconnected gracefully.")
-                    break # Klien terputus
-
-                buffer += data.decode('utf-8') # Decode data yang diterima
-
-                # Memproses pesan jika ada pemisah "\r\n\r\n"
-                while "\r\n\r\n" in buffer:
-                    message, buffer = buffer.split("\r\n\r\n", 1)
-                    logging.info(f"Received message from {self.address}: {message[:50]}...") # Log 50 karakter pertama
-                    
-                    # Memproses pesan menggunakan FileProtocol
-                    hasil = fp.proses_string(message)
-                    hasil += "\r\n\r\n" # Tambahkan pemisah kembali untuk respons
-
-                    # Mengirim hasil kembali ke klien
-                    self.connection.sendall(hasil.encode('utf-8'))
-                    logging.info(f"Sent response to {self.address}: {hasil[:50]}...") # Log 50 karakter pertama
-        except ConnectionResetError:
-            logging.warning(f"Client {self.address} forcibly disconnected.")
+            serve_connection(self.connection, self.address, self)
         except Exception as e:
-            logging.error(f"Error processing client {self.address}: {e}", exc_info=True)
+            self.handle_error(e)
         finally:
-            logging.warning(f"Closing connection for {self.address}")
-            self.connection.close()
+            self.close()
 
 class Server(threading.Thread):
     """
     Kelas Server menerima koneksi klien dan menyerahkannya ke thread pool.
+    Secara default koneksi dikelola oleh ConnectionManager: koneksi idle diparkir
+    di selector dan worker hanya dipakai saat ada request lengkap.
     """
-    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10):
+    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, use_selector=True):
         self.ipinfo = (ipaddress, port)
+        self.idle_timeout = idle_timeout
+        self.use_selector = use_selector
+        self.manager = None
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.executor = ThreadPoolExecutor(max_workers=max_workers) # Inisialisasi thread pool
@@ -80,24 +131,29 @@ class Server(threading.Thread):
         logging.warning(f"Server berjalan di IP address {self.ipinfo[0]} port {self.ipinfo[1]}")
         try:
             self.my_socket.bind(self.ipinfo)
-            self.my_socket.listen(5) # Maksimal 5 koneksi yang tertunda
+            self.my_socket.listen(LISTEN_BACKLOG)
         except Exception as e:
             logging.critical(f"Failed to start server: {e}")
             sys.exit(1) # Keluar jika server tidak bisa dimulai
 
-        while True:
-            try:
-                connection, client_address = self.my_socket.accept()
-                logging.warning(f"Koneksi dari {client_address}")
-                
-                # Membuat instance ClientHandler dan menyerahkan metode run-nya ke thread pool
-                handler = ClientHandler(connection, client_address)
-                self.executor.submit(handler.run) # Menyerahkan tugas ke thread pool
-            except KeyboardInterrupt:
-                logging.warning("Server dimatikan oleh pengguna.")
-                break
-            except Exception as e:
-                logging.error(f"Error accepting new connection: {e}", exc_info=True)
+        if self.use_selector:
+            self.manager = ConnectionManager(self.my_socket, self.executor, ClientHandler,
+                                             idle_timeout=self.idle_timeout)
+            self.manager.serve_forever()
+        else:
+            while True:
+                try:
+                    connection, client_address = self.my_socket.accept()
+                    logging.warning(f"Koneksi dari {client_address}")
+
+                    # Membuat instance ClientHandler dan menyerahkan metode run-nya ke thread pool
+                    handler = ClientHandler(connection, client_address)
+                    self.executor.submit(handler.run) # Menyerahkan tugas ke thread pool
+                except KeyboardInterrupt:
+                    logging.warning("Server dimatikan oleh pengguna.")
+                    break
+                except Exception as e:
+                    logging.error(f"Error accepting new connection: {e}", exc_info=True)
         
         # Menutup thread pool saat server berhenti
         self.executor.shutdown(wait=True)
@@ -105,12 +161,46 @@ class Server(threading.Thread):
         logging.warning("Server berhenti.")
 
 
-def main():
+def parse_args(argv=None):
+    """
+    Argumen command line, dipakai juga oleh benchmark_matrix.py untuk
+    menjalankan server di port dan jumlah worker tertentu.
+    """
+    parser = argparse.ArgumentParser(description="File server dengan thread pool")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=6666)
+    parser.add_argument('--workers', type=int, default=50, help="jumlah worker thread pool")
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="detik sebelum koneksi keep-alive yang idle ditutup")
+    parser.add_argument('--blocking', action='store_true',
+                        help="mode lama: satu worker per koneksi selama koneksi terbuka")
+    parser.add_argument('--storage-dir', default=None,
+                        help="direktori penyimpanan file (default: files/ di samping skrip)")
+    parser.add_argument('--peers', default='',
+                        help="server peer untuk replikasi UPLOAD: h1:p1,h2:p2 atau @file")
+    parser.add_argument('--sync-acks', type=int, default=1,
+                        help="jumlah peer yang harus mengonfirmasi sebelum UPLOAD dijawab")
+    add_durability_args(parser)
+    add_bandwidth_args(parser)
+    tracing.add_trace_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     Fungsi utama untuk menjalankan server.
     """
-    # Anda bisa mengatur port di sini
-    svr = Server(ipaddress='0.0.0.0', port=6666, max_workers=50) # Contoh dengan 20 worker thread
+    global fp, scheduler
+    args = parse_args(argv)
+    scheduler = scheduler_from_args(args)
+    tracing.configure_from_args(args)
+    peers = parse_node_list(args.peers) if args.peers else []
+    if args.storage_dir or peers or args.durability != 'none':
+        replicator = Replicator(peers, sync_acks=args.sync_acks) if peers else None
+        fp = FileProtocol(storage_dir=args.storage_dir, replicator=replicator,
+                          durability=durability_from_args(args))
+    svr = Server(ipaddress=args.host, port=args.port, max_workers=args.workers,
+                 idle_timeout=args.idle_timeout, use_selector=not args.blocking)
     svr.start()
     
     # Menjaga main thread tetap hidup agar server daemon thread bisa berjalan
@@ -0,0 +1,155 @@
+import binascii
+import json
+
+import tracing
+
+"""
+* stream_codec.py berisi helper untuk memproses payload base64 secara
+bertahap (per chunk), sehingga data tidak perlu di-decode sekaligus
+dan bisa langsung di-hash / ditulis sambil diproses.
+"""
+
+# Ukuran chunk base64 default; kelipatan 4 agar setiap chunk bisa di-decode sendiri
+B64_CHUNK_SIZE = 4 * 256 * 1024
+# Ukuran chunk file yang di-encode sekaligus; kelipatan 3 agar hasil base64 setiap
+# chunk bisa langsung disambung tanpa padding di tengah
+B64_ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+# Escape \n, \r dan \t di string JSON (misalnya base64 berbaris dari encoder lain)
+# menjadi whitespace; a2b_base64 mengabaikannya, tetapi whitespace harus dibuang
+# dulu agar perhitungan kelipatan 4 per chunk tetap benar
+B64_WHITESPACE = ' \t\r\n'
+_B64_WHITESPACE_BYTES = B64_WHITESPACE.encode('ascii')
+
+
+def strip_b64_whitespace(data):
+    """
+    Membuang whitespace dari data base64 (str atau bytes); data tanpa whitespace
+    dikembalikan apa adanya tanpa disalin.
+    """
+    if isinstance(data, str):
+        if any(c in data for c in B64_WHITESPACE):
+            return data.translate({ord(c): None for c in B64_WHITESPACE})
+        return data
+    if any(c in data for c in _B64_WHITESPACE_BYTES):
+        return bytes(data).translate(None, _B64_WHITESPACE_BYTES)
+    return data
+
+
+class Base64StreamDecoder:
+    """
+    Decoder base64 inkremental. Data base64 (str atau bytes) dapat diberikan
+    sepotong-sepotong lewat feed(); sisa karakter yang belum kelipatan 4
+    disimpan sampai potongan berikutnya datang.
+    """
+    def __init__(self):
+        self.pending = b''
+
+    def feed(self, data):
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        data = strip_b64_whitespace(data)
+        if self.pending:
+            data = self.pending + data
+        usable = len(data) - (len(data) % 4)
+        self.pending = data[usable:]
+        if not usable:
+            return b''
+        return binascii.a2b_base64(data[:usable])
+
+    def finish(self):
+        """
+        Memastikan tidak ada sisa data yang terpotong di akhir stream.
+        """
+        if self.pending:
+            raise ValueError(f"Data base64 terpotong ({len(self.pending)} karakter sisa).")
+        return b''
+
+
+def iter_b64decode(b64_data, chunk_size=B64_CHUNK_SIZE):
+    """
+    Men-decode string base64 utuh per chunk. Menghasilkan potongan bytes
+    ter-decode; setiap potongan bisa langsung di-hash atau ditulis ke disk
+    sehingga tidak perlu satu pass tambahan atas seluruh data.
+    """
+    chunk_size -= chunk_size % 4
+    b64_data = strip_b64_whitespace(b64_data)
+    for start in range(0, len(b64_data), chunk_size):
+        chunk = b64_data[start:start + chunk_size]
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        yield binascii.a2b_base64(chunk)
+
+
+def b64decode_hashed(b64_data, hasher, out=None, chunk_size=B64_CHUNK_SIZE):
+    """
+    Men-decode base64 sambil meng-update hasher (misalnya hashlib.sha256()).
+    Jika 'out' diberikan (file object), hasil decode juga ditulis ke sana.
+    Mengembalikan jumlah byte hasil decode.
+    """
+    total = 0
+    for chunk in iter_b64decode(b64_data, chunk_size):
+        hasher.update(chunk)
+        if out is not None:
+            out.write(chunk)
+        total += len(chunk)
+    return total
+
+
+class Base64FileBody:
+    """
+    Isi file yang dikirim sebagai string base64 di dalam respons JSON. File
+    dibaca dan di-encode per chunk saat respons dikirim (lihat
+    iter_json_response). File sudah dibuka saat objek dibuat, sehingga isi
+    yang terkirim tetap utuh walaupun file diganti sebelum pengiriman selesai.
+    """
+    def __init__(self, path, chunk_size=B64_ENCODE_CHUNK_SIZE):
+        self.fp = open(path, 'rb')
+        self.chunk_size = chunk_size - chunk_size % 3
+
+    def __iter__(self):
+        try:
+            while True:
+                with tracing.span('disk_read'):
+                    chunk = self.fp.read(self.chunk_size)
+                if not chunk:
+                    break
+                with tracing.span('b64_encode', bytes=len(chunk)):
+                    encoded = binascii.b2a_base64(chunk, newline=False)
+                yield encoded
+        finally:
+            self.close()
+
+    def close(self):
+        self.fp.close()
+
+
+def iter_json_response(response, terminator=b''):
+    """
+    Meng-encode dictionary respons menjadi potongan bytes JSON, hasilnya identik
+    dengan json.dumps(response) (+ terminator). Jika data_file berisi
+    Base64FileBody, field tersebut ditulis paling akhir dan isinya dialirkan per
+    chunk, sehingga memori yang dipakai tetap sebesar satu chunk berapa pun
+    ukuran filenya.
+    """
+    body = response.get('data_file')
+    if not isinstance(body, Base64FileBody):
+        yield json.dumps(response).encode('utf-8') + terminator
+        return
+    try:
+        header = {k: v for k, v in response.items() if k != 'data_file'}
+        prefix = json.dumps(header)[:-1] + (', ' if header else '') + '"data_file": "'
+        # Prefix digabung dengan chunk pertama dan penutup dengan chunk terakhir:
+        # write kecil yang terpisah (header lalu body) memicu Nagle + delayed ACK
+        # (~40 ms per respons). File yang muat dalam satu chunk terkirim sekaligus.
+        pending = prefix.encode('utf-8')
+        first = True
+        for chunk in body:
+            if first:
+                pending += chunk
+                first = False
+                continue
+            yield pending
+            pending = chunk
+        yield pending + b'"}' + terminator
+    finally:
+        body.close()
@@ -6,9 +6,14 @@ import math
 from datetime import datetime
 import csv
 import socket # Import socket for the new stats request
+import asyncio
+import multiprocessing
+import queue
 
 # Import fungsi-fungsi dari client.py yang sudah dimodifikasi
-from file_client_cli import connect_to_server, remote_upload, remote_get, generate_binary_file, remote_delete
+from file_client_cli import connect_to_server, remote_upload, remote_get
+from async_file_client import AsyncFileClient
+import corpus
 
 # --- START: Pengaturan Jalur Absolut ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -36,14 +41,29 @@ FILE_VOLUMES_MB = [10, 50, 100]
 CLIENT_WORKER_POOLS = [1, 5, 50]
 SERVER_WORKER_POOLS = [1, 5, 50] # This is now just for reporting what server config was expected
 
+# Isi file uji: 0.0 = semua byte nol (best case yang tidak realistis), 1.0 = acak penuh
+CORPUS_ENTROPY = 1.0
+# Uji distribusi ukuran file: (profil, jumlah file, ukuran file terbesar dalam MB)
+CORPUS_PROFILE_TESTS = [('mixed', 40, 10)]
+# Jumlah proses agen load generator di localhost. Dengan 1, semua klien berjalan sebagai
+# thread di proses ini; dengan N > 1, klien dibagi ke N proses (encode/decode base64 dan
+# json di sisi klien tidak lagi antre di satu GIL).
+CLIENT_PROCESSES = 1
+# Batas waktu menunggu semua proses agen siap di barrier start
+AGENT_START_TIMEOUT = 60
+# Mode asyncio: (operasi, ukuran file MB, jumlah sesi konkuren), semua sesi dijalankan
+# dari satu thread event loop sehingga ribuan klien tidak butuh ribuan thread
+ASYNC_SESSION_TESTS = [('get', 1, 1000)]
+
 # Hasil pengujian
 results = []
 lock = threading.Lock() # Untuk mengamankan akses ke daftar hasil
 
-def run_client_task(client_id, op_type, local_file_full_path, file_size_bytes, server_address_tuple):
+def run_client_task(client_id, op_type, local_file_full_path, file_size_bytes, server_address_tuple, expected_sha256=None):
     """
     Fungsi yang dijalankan oleh setiap worker client.
     Melakukan operasi upload atau get (download) dan mengukur waktunya.
+    Untuk GET, isi file diverifikasi terhadap expected_sha256 (jika ada).
     """
     client_conn_success = False
     client_op_success = False
@@ -59,7 +79,8 @@ def run_client_task(client_id, op_type, local_file_full_path, file_size_bytes, s
                 client_op_success = remote_upload(sock, local_file_full_path, client_id=client_id)
             elif op_type == 'get':
                 server_filename_for_request = os.path.basename(local_file_full_path)
-                client_op_success = remote_get(sock, server_filename_for_request, client_id=client_id)
+                client_op_success = remote_get(sock, server_filename_for_request, client_id=client_id,
+                                               expected_sha256=expected_sha256)
         except Exception as e:
             print(f"ERROR (Client {client_id}): Exception selama operasi {op_type}: {e}")
             client_op_success = False
@@ -83,99 +104,294 @@ def run_client_task(client_id, op_type, local_file_full_path, file_size_bytes, s
         'bytes_processed': file_size_bytes if client_op_success else 0
     }
 
-def run_test_combination(operation, file_volume_mb, client_workers, server_workers_info):
+def latency_percentile(sorted_times, pct):
     """
-    Menjalankan satu kombinasi pengujian.
+    Persentil (nearest-rank) dari daftar waktu yang sudah diurutkan.
+    Mengembalikan 0 jika daftar kosong.
     """
-    print(f"\n--- Memulai Uji Kombinasi ---")
-    print(f"Operasi: {operation.upper()}, Volume File: {file_volume_mb} MB, Klien Worker: {client_workers}, Server Worker (Info): {server_workers_info}")
+    if not sorted_times:
+        return 0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_times))))
+    return sorted_times[rank - 1]
 
-    file_size_bytes = file_volume_mb * 1024 * 1024
-    
-    test_file_name_full_path = os.path.join(TEST_DIR, f"test_file_{file_volume_mb}MB.bin")
-    downloaded_file_path = os.path.join(DOWNLOAD_DIR, os.path.basename(test_file_name_full_path))
-
-    if operation == 'upload':
-        print(f"DEBUG (run_test_combination): Membuat file di: {test_file_name_full_path}")
-        if not generate_binary_file(test_file_name_full_path, file_volume_mb):
-            print(f"Gagal membuat file dummy: {test_file_name_full_path}. Melewati kombinasi ini.")
-            return
-    elif operation == 'get':
-        if not os.path.exists(test_file_name_full_path):
-            print(f"Peringatan: File {os.path.basename(test_file_name_full_path)} tidak ada secara lokal untuk operasi GET. Pastikan file ini ada di server.")
-        pass
+def _failed_result(worker_id=-1):
+    return {'worker_id': worker_id, 'total_time': 0, 'success': False, 'conn_success': False, 'bytes_processed': 0}
 
-    server_address_tuple = (SERVER_IP, SERVER_PORT)
-    
+def _run_client_threads(task_args, client_workers):
+    """
+    Menjalankan daftar argumen run_client_task di thread pool klien proses ini.
+    """
     individual_client_results = []
-    
-    successful_clients = 0
-    failed_clients = 0
-    total_time_per_client_sum = 0
-    total_bytes_processed = 0
-
     with concurrent.futures.ThreadPoolExecutor(max_workers=client_workers) as executor:
-        futures = []
-        for i in range(client_workers):
-            futures.append(executor.submit(run_client_task, i + 1, operation, test_file_name_full_path, file_size_bytes, server_address_tuple))
+        futures = [executor.submit(run_client_task, *args) for args in task_args]
 
         for future in concurrent.futures.as_completed(futures):
             try:
-                result = future.result()
-                individual_client_results.append(result)
-                if result['success']:
-                    successful_clients += 1
-                    total_time_per_client_sum += result['total_time']
-                    total_bytes_processed += result['bytes_processed']
-                else:
-                    failed_clients += 1
+                individual_client_results.append(future.result())
             except Exception as e:
                 print(f"ERROR (run_test_combination): Error dalam worker client: {e}")
-                failed_clients += 1
+                individual_client_results.append(_failed_result())
+    return individual_client_results
+
+def _client_agent(agent_id, task_args, threads, start_barrier, result_queue):
+    """
+    Proses agen load generator: menunggu barrier start bersama agar semua agen mulai
+    serentak, lalu menjalankan bagiannya dengan 'threads' thread dan mengirim hasil
+    per request ke proses utama.
+    """
+    try:
+        start_barrier.wait(AGENT_START_TIMEOUT)
+    except threading.BrokenBarrierError:
+        result_queue.put((agent_id, None))
+        return
+    result_queue.put((agent_id, _run_client_threads(task_args, threads)))
+
+def _execute_client_tasks_multiprocess(task_args, client_workers, processes):
+    """
+    Membagi task ke 'processes' proses agen (round-robin); total thread semua agen
+    sama dengan client_workers. Waktu wall-clock diukur sejak barrier start terbuka.
+    Mengembalikan (hasil per task, waktu wall-clock, jumlah agen yang dijalankan).
+    """
+    # Setiap agen minimal satu thread, jadi jumlah agen tidak boleh melebihi client_workers
+    processes = min(processes, client_workers, len(task_args))
+    shares = [task_args[i::processes] for i in range(processes)]
+    threads = [client_workers // processes + (1 if i < client_workers % processes else 0)
+               for i in range(processes)]
+    start_barrier = multiprocessing.Barrier(processes + 1) # semua agen + proses utama
+    result_queue = multiprocessing.Queue()
+    agents = [multiprocessing.Process(target=_client_agent, args=(i, share, threads[i], start_barrier, result_queue),
+                                      name=f"stress-agent-{i}", daemon=True)
+              for i, share in enumerate(shares)]
+    for agent in agents:
+        agent.start()
+
+    individual_client_results = []
+    pending = set(range(processes))
+    try:
+        start_barrier.wait(AGENT_START_TIMEOUT)
+    except threading.BrokenBarrierError:
+        print(f"ERROR: Proses agen tidak siap dalam {AGENT_START_TIMEOUT} detik; kombinasi dibatalkan.")
+        for agent in agents:
+            agent.terminate()
+        return [_failed_result(args[0]) for args in task_args], 0, processes
+    wall_start = time.time()
+
+    while pending:
+        try:
+            agent_id, agent_results = result_queue.get(timeout=1)
+        except queue.Empty:
+            if not any(agent.is_alive() for agent in agents) and result_queue.empty():
+                break # agen mati tanpa mengirim hasil
+            continue
+        pending.discard(agent_id)
+        if agent_results is None:
+            agent_results = [_failed_result(args[0]) for args in shares[agent_id]]
+        individual_client_results.extend(agent_results)
+    wall_time = time.time() - wall_start
+
+    for agent_id in pending:
+        print(f"ERROR: Proses agen {agent_id} berhenti tanpa hasil.")
+        individual_client_results.extend(_failed_result(args[0]) for args in shares[agent_id])
+    for agent in agents:
+        agent.join()
+    return individual_client_results, wall_time, processes
+
+def _execute_client_tasks(task_args, client_workers, processes=None):
+    """
+    Menjalankan daftar argumen run_client_task, di thread pool proses ini atau di
+    beberapa proses agen jika processes (default CLIENT_PROCESSES) > 1.
+    Mengembalikan (hasil per task, waktu wall-clock, jumlah proses klien yang dipakai).
+    """
+    processes = CLIENT_PROCESSES if processes is None else processes
+    if processes > 1 and client_workers > 1 and len(task_args) > 1:
+        return _execute_client_tasks_multiprocess(task_args, client_workers, processes)
+    wall_start = time.time()
+    individual_client_results = _run_client_threads(task_args, client_workers)
+    return individual_client_results, time.time() - wall_start, 1
+
+def _record_combination(operation, file_volume_mb, client_workers, server_workers_info,
+                        individual_client_results, wall_time, total_bytes_attempted, client_processes=1):
+    """
+    Merangkum hasil satu kombinasi, menambahkannya ke 'results' dan mencetaknya.
+    """
+    successful = [r for r in individual_client_results if r['success']]
+    successful_clients = len(successful)
+    failed_clients = len(individual_client_results) - successful_clients
+    total_time_per_client_sum = sum(r['total_time'] for r in successful)
+    total_bytes_processed = sum(r['bytes_processed'] for r in successful)
 
     avg_time_per_client = total_time_per_client_sum / successful_clients if successful_clients > 0 else 0
     throughput_per_client = (total_bytes_processed / successful_clients) / avg_time_per_client if successful_clients > 0 and avg_time_per_client > 0 else 0
+    # Throughput agregat: seluruh byte yang berhasil dibagi waktu wall-clock kombinasi
+    aggregate_throughput = total_bytes_processed / wall_time if wall_time > 0 else 0
+
+    success_times = sorted(r['total_time'] for r in successful)
 
     # These will still be N/A here, but will be updated later
     server_success_count = 'N/A'
     server_failure_count = 'N/A'
 
+    combination_result = {
+        'operation': operation,
+        'file_volume_mb': file_volume_mb,
+        'client_workers': client_workers,
+        # Jumlah proses klien yang benar-benar dijalankan (lihat _execute_client_tasks)
+        'client_processes': client_processes,
+        'server_workers_info': server_workers_info,
+        'avg_time_per_client_s': avg_time_per_client,
+        'throughput_per_client_bps': throughput_per_client,
+        'successful_client_workers': successful_clients,
+        'failed_client_workers': failed_clients,
+        'server_worker_success': server_success_count, # Initial placeholder
+        'server_worker_failure': server_failure_count, # Initial placeholder
+        'total_bytes_attempted_by_clients': total_bytes_attempted,
+        'total_bytes_successfully_processed_by_clients': total_bytes_processed,
+        'wall_time_s': wall_time,
+        'aggregate_throughput_bps': aggregate_throughput,
+        'latency_p50_s': latency_percentile(success_times, 50),
+        'latency_p90_s': latency_percentile(success_times, 90),
+        'latency_p99_s': latency_percentile(success_times, 99),
+        'individual_client_results': individual_client_results
+    }
     with lock:
-        results.append({
-            'operation': operation,
-            'file_volume_mb': file_volume_mb,
-            'client_workers': client_workers,
-            'server_workers_info': server_workers_info,
-            'avg_time_per_client_s': avg_time_per_client,
-            'throughput_per_client_bps': throughput_per_client,
-            'successful_client_workers': successful_clients,
-            'failed_client_workers': failed_clients,
-            'server_worker_success': server_success_count, # Initial placeholder
-            'server_worker_failure': server_failure_count, # Initial placeholder
-            'total_bytes_attempted_by_clients': client_workers * file_size_bytes,
-            'total_bytes_successfully_processed_by_clients': total_bytes_processed,
-            'individual_client_results': individual_client_results
-        })
+        results.append(combination_result)
     
     print(f"--- Hasil Kombinasi {operation.upper()} {file_volume_mb}MB, Klien Worker: {client_workers} ---")
     print(f"  Waktu rata-rata per klien sukses: {avg_time_per_client:.4f} detik")
     print(f"  Throughput rata-rata per klien sukses: {throughput_per_client:.2f} bytes/detik")
+    print(f"  Latensi p50/p90/p99: {combination_result['latency_p50_s']:.4f}/{combination_result['latency_p90_s']:.4f}/{combination_result['latency_p99_s']:.4f} detik")
     print(f"  Klien sukses: {successful_clients}, Klien gagal: {failed_clients}")
     print(f"---------------------------------------------------")
+    return combination_result
 
-    if operation == 'upload' and os.path.exists(test_file_name_full_path):
-        print(f"DEBUG (run_test_combination): Menghapus file yang dihasilkan: {test_file_name_full_path}")
-        try:
-            os.remove(test_file_name_full_path)
-        except OSError as e:
-            print(f"ERROR: Gagal menghapus file {test_file_name_full_path}: {e}")
-    
-    if operation == 'get' and os.path.exists(downloaded_file_path):
-        print(f"DEBUG (run_test_combination): Menghapus file yang diunduh: {downloaded_file_path}")
-        try:
-            os.remove(downloaded_file_path)
-        except OSError as e:
-            print(f"ERROR: Gagal menghapus file {downloaded_file_path}: {e}")
+def run_test_combination(operation, file_volume_mb, client_workers, server_workers_info, server_address_tuple=None):
+    """
+    Menjalankan satu kombinasi pengujian.
+    server_address_tuple: alamat server yang diuji; default (SERVER_IP, SERVER_PORT).
+    Mengembalikan dictionary hasil kombinasi (juga ditambahkan ke 'results').
+    """
+    print(f"\n--- Memulai Uji Kombinasi ---")
+    print(f"Operasi: {operation.upper()}, Volume File: {file_volume_mb} MB, Klien Worker: {client_workers}, Server Worker (Info): {server_workers_info}")
+
+    file_size_bytes = file_volume_mb * 1024 * 1024
+
+    # File uji diambil dari cache corpus: dibuat sekali dengan entropi CORPUS_ENTROPY,
+    # checksum-nya sudah tersimpan di manifest dan dipakai untuk verifikasi GET.
+    try:
+        test_file_name_full_path, expected_sha256 = corpus.ensure_file(
+            f"test_file_{file_volume_mb}MB.bin", file_size_bytes, CORPUS_ENTROPY, seed=file_volume_mb)
+    except OSError as e:
+        print(f"Gagal membuat file uji untuk {file_volume_mb} MB: {e}. Melewati kombinasi ini.")
+        return
+
+    if server_address_tuple is None:
+        server_address_tuple = (SERVER_IP, SERVER_PORT)
+
+    task_args = [(i + 1, operation, test_file_name_full_path, file_size_bytes, server_address_tuple, expected_sha256)
+                 for i in range(client_workers)]
+    individual_client_results, wall_time, client_processes = _execute_client_tasks(task_args, client_workers)
+
+    return _record_combination(operation, file_volume_mb, client_workers, server_workers_info,
+                               individual_client_results, wall_time, client_workers * file_size_bytes,
+                               client_processes=client_processes)
+
+def run_corpus_combination(profile, file_count, max_file_mb, client_workers, server_workers_info, server_address_tuple=None,
+                           operations=OPERATIONS):
+    """
+    Mengunggah lalu mengunduh (dengan verifikasi checksum) sekumpulan file corpus
+    dengan distribusi ukuran 'profile' (lihat corpus.SIZE_PROFILES).
+    Menghasilkan satu kombinasi per operasi: corpus_<profile>_upload dan corpus_<profile>_get.
+    'operations' bisa dibatasi (misalnya hanya ['get'] setelah corpus yang sama di-upload).
+    """
+    print(f"\n--- Memulai Uji Corpus '{profile}': {file_count} file, maks {max_file_mb} MB, Klien Worker: {client_workers} ---")
+    files = corpus.build_corpus(profile, file_count, max_file_mb * 1024 * 1024, entropy=CORPUS_ENTROPY)
+    if server_address_tuple is None:
+        server_address_tuple = (SERVER_IP, SERVER_PORT)
+
+    total_bytes = sum(f['size'] for f in files)
+    combination_results = []
+    for operation in operations:
+        task_args = [(i + 1, operation, f['path'], f['size'], server_address_tuple, f['sha256'])
+                     for i, f in enumerate(files)]
+        individual_client_results, wall_time, client_processes = _execute_client_tasks(task_args, client_workers)
+        combination_results.append(_record_combination(f"corpus_{profile}_{operation}", max_file_mb, client_workers,
+                                                       server_workers_info, individual_client_results, wall_time,
+                                                       total_bytes, client_processes=client_processes))
+    return combination_results
+
+async def run_async_session(client_id, op_type, local_file_full_path, file_size_bytes, server_address_tuple,
+                            expected_sha256=None):
+    """
+    Versi asyncio dari run_client_task: satu sesi klien dengan koneksinya sendiri.
+    """
+    start_time = time.time()
+    client = AsyncFileClient(*server_address_tuple, pool_size=1, client_id=client_id)
+    client_op_success = False
+    try:
+        if op_type == 'upload':
+            client_op_success = bool(await client.upload(local_file_full_path))
+        elif op_type == 'get':
+            client_op_success = bool(await client.get(os.path.basename(local_file_full_path),
+                                                      expected_sha256=expected_sha256))
+    finally:
+        await client.close()
+    return {
+        'worker_id': client_id,
+        'total_time': time.time() - start_time,
+        'success': client_op_success,
+        'conn_success': client.connections_opened > 0,
+        'bytes_processed': file_size_bytes if client_op_success else 0
+    }
+
+def _raise_open_file_limit(needed):
+    """
+    Menaikkan batas file descriptor (soft limit) agar ribuan socket bisa dibuka sekaligus.
+    """
+    try:
+        import resource
+    except ImportError: # bukan Unix
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+def run_async_combination(operation, file_volume_mb, sessions, server_workers_info, server_address_tuple=None):
+    """
+    Menjalankan 'sessions' sesi klien secara konkuren dengan AsyncFileClient dari satu
+    event loop. Hasilnya dicatat sebagai kombinasi async_<operasi>.
+    """
+    print(f"\n--- Memulai Uji Async {operation.upper()}: {file_volume_mb} MB, {sessions} sesi ---")
+    file_size_bytes = file_volume_mb * 1024 * 1024
+    try:
+        test_file_name_full_path, expected_sha256 = corpus.ensure_file(
+            f"test_file_{file_volume_mb}MB.bin", file_size_bytes, CORPUS_ENTROPY, seed=file_volume_mb)
+    except OSError as e:
+        print(f"Gagal membuat file uji untuk {file_volume_mb} MB: {e}. Melewati kombinasi ini.")
+        return
+    if server_address_tuple is None:
+        server_address_tuple = (SERVER_IP, SERVER_PORT)
+    _raise_open_file_limit(sessions + 256)
+
+    async def run_all():
+        tasks = [run_async_session(i + 1, operation, test_file_name_full_path, file_size_bytes,
+                                   server_address_tuple, expected_sha256)
+                 for i in range(sessions)]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        individual = []
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                print(f"ERROR (run_async_combination): Error dalam sesi klien: {outcome}")
+                outcome = _failed_result()
+            individual.append(outcome)
+        return individual
+
+    wall_start = time.time()
+    individual_client_results = asyncio.run(run_all())
+    wall_time = time.time() - wall_start
+    return _record_combination(f"async_{operation}", file_volume_mb, sessions, server_workers_info,
+                               individual_client_results, wall_time, sessions * file_size_bytes,
+                               client_processes=1)
 
 # --- New function to get server stats ---
 def get_server_total_stats(server_address_tuple):
@@ -255,6 +471,13 @@ def main():
             for server_pool_info in SERVER_WORKER_POOLS: # This is now just for reporting what server config was expected
                 run_test_combination('upload', volume, client_pool, server_pool_info)
                 run_test_combination('get', volume, client_pool, server_pool_info)
+
+    for profile, file_count, max_file_mb in CORPUS_PROFILE_TESTS:
+        for client_pool in CLIENT_WORKER_POOLS:
+            run_corpus_combination(profile, file_count, max_file_mb, client_pool, 'N/A')
+
+    for operation, volume, sessions in ASYNC_SESSION_TESTS:
+        run_async_combination(operation, volume, sessions, 'N/A')
     
     # --- START: Get global server stats and update results ---
     server_address_tuple = (SERVER_IP, SERVER_PORT)
@@ -305,7 +528,7 @@ def save_results_to_csv(results_data, filename="performance_test_results.csv"):
     filepath = os.path.join(RESULTS_DIR, filename)
     with open(filepath, 'w', newline='') as csvfile:
         fieldnames = [
-            'Nomor', 'Operasi', 'Volume_MB', 'Jumlah_Client_Worker', 'Jumlah_Server_Worker',
+            'Nomor', 'Operasi', 'Volume_MB', 'Jumlah_Client_Worker', 'Jumlah_Client_Proses', 'Jumlah_Server_Worker',
             'Waktu_Total_Per_Client_S', 'Throughput_Per_Client_Bps',
             'Client_Sukses', 'Client_Gagal', 'Server_Sukses', 'Server_Gagal'
         ]
@@ -318,6 +541,7 @@ def save_results_to_csv(results_data, filename="performance_test_results.csv"):
                 'Operasi': res['operation'],
                 'Volume_MB': res['file_volume_mb'],
                 'Jumlah_Client_Worker': res['client_workers'],
+                'Jumlah_Client_Proses': res['client_processes'],
                 'Jumlah_Server_Worker': res['server_workers_info'],
                 'Waktu_Total_Per_Client_S': f"{res['avg_time_per_client_s']:.4f}",
                 'Throughput_Per_Client_Bps': f"{res['throughput_per_client_bps']:.2f}",
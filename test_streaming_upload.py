@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from connection_manager import _Connection
+from file_protocol import FileProtocol
+
+"""
+* Frame UPLOAD yang payload base64-nya berisi escape string JSON (\\/ dari
+  encoder PHP/JS, \\n dari base64 berbaris) harus menghasilkan file yang sama,
+  baik frame tiba utuh maupun terpotong di posisi mana pun.
+"""
+
+
+class _Handler:
+    def __init__(self, fp):
+        self.fp = fp
+        self.responses = []
+
+    def process_message(self, message):
+        self.responses.append(json.loads(self.fp.proses_string(message)))
+        return True
+
+    def begin_upload(self, filename):
+        return self.fp.begin_upload(filename)
+
+    def finish_upload(self, upload):
+        raw = b''.join(self.fp.finish_upload(upload))
+        self.responses.append(json.loads(raw[:-len(b"\r\n\r\n")]))
+        return True
+
+
+def _escaped_frame(filename, data):
+    b64 = base64.encodebytes(data).decode('ascii') # baris 76 karakter diakhiri \n
+    payload = json.dumps(b64)[1:-1].replace('/', '\\/')
+    return f'{{"command": "UPLOAD", "params": ["{filename}", "{payload}"]}}\r\n\r\n'.encode('ascii')
+
+
+class StreamingUploadEscapeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fp = FileProtocol(storage_dir=self.tmp.name)
+        # Byte 0xff berulang menghasilkan banyak '/' di base64
+        self.data = bytes(range(256)) * 3 + b'\xff' * 300
+        self.frame = _escaped_frame('escaped.bin', self.data)
+        self.assertIn(b'\\/', self.frame)
+        self.assertIn(b'\\n', self.frame)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _send(self, pieces):
+        handler = _Handler(self.fp)
+        conn = _Connection(None, ('test', 0), handler)
+        for piece in pieces:
+            conn.buffer += piece
+            self.assertTrue(conn.process_ready())
+        self.assertIsNone(conn.upload)
+        self.assertEqual(len(handler.responses), 1)
+        return handler.responses[0]
+
+    def _assert_stored(self, response):
+        self.assertEqual(response['status'], 'OK', response)
+        self.assertEqual(response['data_sha256'], hashlib.sha256(self.data).hexdigest())
+        with open(self.fp.file._get_full_path('escaped.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_whole_frame(self):
+        self._assert_stored(self._send([self.frame]))
+
+    def test_split_frame(self):
+        for cut in range(1, len(self.frame)):
+            with self.subTest(cut=cut):
+                self._assert_stored(self._send([self.frame[:cut], self.frame[cut:]]))
+
+    def test_byte_by_byte(self):
+        self._assert_stored(self._send([self.frame[i:i + 1] for i in range(len(self.frame))]))
+
+    def test_no_leftover_temp_files(self):
+        self._send([self.frame[:200], self.frame[200:]])
+        self.assertEqual(os.listdir(self.fp.file.tmp_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
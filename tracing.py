@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+import collections
+
+"""
+* tracing.py mencatat durasi setiap fase request di server (menunggu di
+  antrean worker, recv, parsing JSON, baca disk, encode base64, sendall,
+  commit file, replikasi, ...) sebagai span.
+
+* Tracing mati secara default. Jika dinyalakan (enable() atau opsi
+  --trace-sample di server), hanya sebagian request yang dicatat
+  (sample_rate), dan span disimpan di ring buffer di memori sehingga
+  yang tersimpan selalu request-request terakhir.
+
+* Perintah TRACE_DUMP mengembalikan isi buffer dalam format Chrome trace
+  JSON yang bisa dibuka di chrome://tracing atau https://ui.perfetto.dev.
+
+* Pemakaian di kode server:
+    with tracing.request('request'):   # awal satu request, keputusan sampling
+        with tracing.span('json_parse'):
+            ...
+  Saat tracing mati, request()/span() hanya memeriksa satu variabel global
+  dan mengembalikan context manager kosong.
+"""
+
+DEFAULT_BUFFER_SIZE = 100000
+
+_tracer = None # Tracer aktif; None berarti tracing mati
+_local = threading.local() # sampled, request span aktif, dan fase tertunda per thread
+
+
+class Tracer:
+    def __init__(self, sample_rate=1.0, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.sample_rate = sample_rate
+        self.events = collections.deque(maxlen=buffer_size)
+        self.pid = os.getpid()
+        self.thread_names = {}
+
+    def record(self, name, start, end, args=None):
+        """
+        Mencatat satu span selesai; start/end dari time.perf_counter().
+        """
+        tid = threading.get_native_id()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event = {"name": name, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                 "pid": self.pid, "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def dump(self, clear=False):
+        events = list(self.events)
+        if clear:
+            self.events.clear()
+        meta = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in list(self.thread_names.items())]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+    def annotate(self, **args):
+        self.args.update(args)
+
+
+class _RequestSpan(_Span):
+    __slots__ = ('given_start', 'phases')
+
+    def __init__(self, tracer, name, args, start=None, phases=None):
+        _Span.__init__(self, tracer, name, args)
+        self.given_start = start
+        self.phases = phases
+
+    def __enter__(self):
+        for name, start, end, args in (getattr(_local, 'phases', None) or []) + (self.phases or []):
+            self.tracer.record(name, start, end, args)
+        _local.phases = None
+        _local.sampled = True
+        _local.request = self
+        _Span.__enter__(self)
+        if self.given_start is not None:
+            self.start = self.given_start
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.sampled = False
+        _local.request = None
+        return _Span.__exit__(self, exc_type, exc, tb)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def annotate(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(sample_rate=1.0, buffer_size=DEFAULT_BUFFER_SIZE):
+    global _tracer
+    _tracer = Tracer(sample_rate, buffer_size)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def request(name='request', start=None, phases=None, **args):
+    """
+    Span terluar satu request. Di sinilah keputusan sampling dibuat: span()
+    di dalamnya hanya dicatat jika request ini terpilih. Request yang diproses
+    bertahap (misalnya UPLOAD streaming) memberikan waktu mulainya sendiri
+    ('start') dan fase yang dikumpulkan sebelumnya ('phases', lihat take_phases).
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    if tracer.sample_rate < 1.0 and random.random() >= tracer.sample_rate:
+        _local.phases = None
+        return _NOOP
+    return _RequestSpan(tracer, name, args, start, phases)
+
+
+def span(name, **args):
+    tracer = _tracer
+    if tracer is None or not getattr(_local, 'sampled', False):
+        return _NOOP
+    return _Span(tracer, name, args)
+
+
+def annotate(**args):
+    """
+    Menambahkan atribut ke request span yang sedang berjalan (misalnya nama
+    perintah yang baru diketahui setelah JSON di-parse).
+    """
+    if _tracer is not None and getattr(_local, 'sampled', False):
+        _local.request.annotate(**args)
+
+
+def note_phase(name, start, end, **args):
+    """
+    Fase yang terjadi sebelum request dimulai (misalnya recv di thread selector
+    atau menunggu di antrean worker). Dicatat oleh request span berikutnya di
+    thread ini jika request tersebut terpilih sampling.
+    """
+    if _tracer is None:
+        return
+    phases = getattr(_local, 'phases', None)
+    if phases is None:
+        phases = _local.phases = []
+    phases.append((name, start, end, args))
+
+
+def take_phases():
+    """
+    Mengambil fase tertunda thread ini (lihat note_phase) untuk request yang
+    berlanjut di thread lain; dicatat lewat request(..., phases=...).
+    """
+    phases = getattr(_local, 'phases', None) or []
+    _local.phases = None
+    return phases
+
+
+def dump(clear=False):
+    tracer = _tracer
+    return tracer.dump(clear) if tracer is not None else None
+
+
+def add_trace_args(parser):
+    group = parser.add_argument_group("tracing (lihat tracing.py)")
+    group.add_argument('--trace-sample', type=float, default=0.0,
+                       help="fraksi request yang di-trace (0 = tracing mati, 1 = semua)")
+    group.add_argument('--trace-buffer', type=int, default=DEFAULT_BUFFER_SIZE,
+                       help="jumlah span maksimal di ring buffer")
+
+
+def configure_from_args(args):
+    if args.trace_sample > 0:
+        enable(sample_rate=min(args.trace_sample, 1.0), buffer_size=args.trace_buffer)